@@ -0,0 +1,185 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .id_allocator import order_item_ids
+from .inventory import InsufficientStockError, reserve_stock
+from .models import Order, OrderItem, Product
+from .pricing import to_cents, totals
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into an order."""
+
+
+def whole_number(value):
+    """`value` as an int; ValueError unless it is a whole number (1.7, "x")."""
+    if isinstance(value, bool):
+        raise ValueError(value)
+    number = Decimal(str(value))
+    if not number.is_finite() or number != number.to_integral_value():
+        raise ValueError(value)
+    return int(number)
+
+
+def create_pending_order(cart_items):
+    """Create a pending order with all of its items in one transaction.
+
+    `cart_items` is the kiosk cart, a list of
+    `{"product": {"product_id": ..., "product_price": ...}, "quantity": ...}`.
+    All products are fetched with a single query and the items are inserted
+    with a single `bulk_create`, so the number of queries does not grow with
+    the size of the cart. The stock is reserved for the order with one
+    conditional UPDATE on product_available. The order amount is computed
+    from the validated prices, not taken from the kiosk. Returns the order
+    and the cart's products keyed by product ID.
+    """
+    if not cart_items:
+        raise CheckoutError("Error: The cart is empty.")
+
+    try:
+        lines = [
+            (
+                int(item["product"]["product_id"]),
+                whole_number(item["quantity"]),
+                Decimal(str(item["product"]["product_price"])),
+            )
+            for item in cart_items
+        ]
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise CheckoutError(
+            "Error: Every item needs a product with a product_id and a "
+            "product_price, and a quantity."
+        )
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk([product_id for product_id, _, _ in lines])
+
+        # Validate the whole cart before writing anything
+        required = {}
+        for product_id, quantity, price in lines:
+            product = products.get(product_id)
+            if product is None:
+                raise CheckoutError(
+                    f"Error: Product with ID {product_id} does not exist."
+                )
+
+            if quantity <= 0:
+                raise CheckoutError(
+                    f"Error: Invalid quantity for {product.product_name}."
+                )
+
+            if price != product.product_price:
+                raise CheckoutError(
+                    f"Error: The price of {product.product_name} has changed to {product.product_price}."
+                )
+
+            required[product_id] = required.get(product_id, 0) + quantity
+
+        order = Order.objects.create(
+            order_amount=to_cents(
+                sum((price * quantity for _, quantity, price in lines), Decimal("0"))
+            ),
+            order_status="Pending",
+        )
+
+        # Set the stock aside until the order is paid or voided
+        try:
+            reserve_stock(required, order.order_id)
+        except InsufficientStockError as e:
+            raise CheckoutError(f"Error: {e}")
+
+        item_ids = order_item_ids.allocate(len(lines))
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order_item_id=order_item_id,
+                order=order,
+                product=products[product_id],
+                product_price=price,
+                order_item_quantity=quantity,
+            )
+            for (product_id, quantity, price), order_item_id in zip(lines, item_ids)
+        )
+
+    return order, products
+
+
+def quote_cart(cart_lines):
+    """Price a cart with current data, without creating anything.
+
+    `cart_lines` is a list of `{"product_id": ..., "quantity": ...}`, with an
+    optional `"price"` the kiosk is showing. All products are fetched with a
+    single query. Availability is checked against product_available, so
+    stock reserved by pending orders is not offered again. VAT is added on
+    top of the subtotal, as at payment.
+    """
+    if not isinstance(cart_lines, list) or not all(
+        isinstance(line, dict) for line in cart_lines
+    ):
+        raise CheckoutError("Error: items must be a list of objects.")
+
+    lines = []
+    for line in cart_lines:
+        try:
+            price = Decimal(str(line["price"])) if "price" in line else None
+            lines.append(
+                (int(line["product_id"]), whole_number(line["quantity"]), price)
+            )
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise CheckoutError(
+                "Error: Every item needs a product_id and a quantity, "
+                "and a numeric price if it has one."
+            )
+
+    products = Product.objects.only(
+        "product_id", "product_name", "product_price", "product_available"
+    ).in_bulk([product_id for product_id, _, _ in lines])
+
+    # Stock is shared by lines for the same product
+    required = {}
+    for product_id, quantity, _ in lines:
+        required[product_id] = required.get(product_id, 0) + max(quantity, 0)
+
+    items = []
+    errors = []
+    subtotal = Decimal("0")
+    for product_id, quantity, price in lines:
+        product = products.get(product_id)
+        if product is None:
+            errors.append(f"Product with ID {product_id} does not exist.")
+            items.append({"product_id": product_id, "error": "Product not found."})
+            continue
+
+        item = {
+            "product_id": product_id,
+            "product_name": product.product_name,
+            "product_price": product.product_price,
+            "quantity": quantity,
+            "available": product.product_available,
+            "in_stock": product.product_available >= required[product_id],
+            "line_total": product.product_price * quantity,
+        }
+        if price is not None:
+            item["price_changed"] = price != product.product_price
+        items.append(item)
+
+        if quantity <= 0:
+            # Left out of the subtotal
+            errors.append(f"Invalid quantity for {product.product_name}.")
+            continue
+        if not item["in_stock"]:
+            errors.append(
+                f"Insufficient stock for {product.product_name}. Available: {product.product_available}, Required: {required[product_id]}."
+            )
+        subtotal += item["line_total"]
+
+    cart_totals = totals(subtotal)
+    return {
+        "items": items,
+        "subtotal": cart_totals.subtotal,
+        "vat_percentage": cart_totals.vat_percentage,
+        "vat_amount": cart_totals.vat_amount,
+        "total": cart_totals.total,
+        "valid": not errors,
+        "errors": errors,
+    }
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+import urllib.request
+import zoneinfo
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def fetch_reference_time(url, timeout=5):
+    """Return the current UTC time according to a worldtimeapi-style JSON URL."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        data = json.loads(response.read().decode("utf-8"))
+
+    if "unixtime" in data:
+        return datetime.fromtimestamp(data["unixtime"], tz=zoneinfo.ZoneInfo("UTC"))
+    return datetime.fromisoformat(data.get("utc_datetime") or data["datetime"])
+
+
+class ShopClock:
+    """Local clock, optionally corrected by an offset from a reference source.
+
+    `now()` only reads the local clock and never touches the network. When
+    TIME_REFERENCE_URL is set, a background thread measures the offset to the
+    reference every TIME_REFERENCE_REFRESH_SECONDS and `now()` applies the
+    last measured offset; until the first measurement (or if the reference
+    is unreachable) the local clock is used as is.
+    """
+
+    def __init__(self, reference_url=None, refresh_seconds=None):
+        self.reference_url = reference_url
+        self.refresh_seconds = refresh_seconds
+        self.offset = timedelta(0)
+        self.synced_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Current time in the shop's time zone."""
+        self._ensure_started()
+        shop_time_zone = zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE)
+        return (timezone.now() + self.offset).astimezone(shop_time_zone)
+
+    def _ensure_started(self):
+        if self._thread is not None or not self._reference_url():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="shop-clock", daemon=True
+                )
+                self._thread.start()
+
+    def _reference_url(self):
+        return self.reference_url or settings.TIME_REFERENCE_URL
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds or settings.TIME_REFERENCE_REFRESH_SECONDS)
+
+    def refresh(self):
+        try:
+            sent = timezone.now()
+            reference = fetch_reference_time(self._reference_url())
+            received = timezone.now()
+        except Exception as e:
+            print(f"Could not refresh the clock offset: {e}")
+            return
+
+        # Assume the reference was read halfway through the round trip
+        self.offset = reference - (sent + (received - sent) / 2)
+        self.synced_at = received
+
+
+shop_clock = ShopClock()
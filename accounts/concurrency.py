@@ -0,0 +1,117 @@
+import time
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+
+# Rows matched by one conditional UPDATE. The row conditions are OR-ed
+# together, and SQLite rejects expressions nested about 1000 deep.
+UPDATE_BATCH_SIZE = 250
+
+
+def batched(items, size=UPDATE_BATCH_SIZE):
+    """Split `items` into lists of at most `size`."""
+    items = list(items)
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
+class ConflictError(Exception):
+    """Raised when a row was changed by someone else since it was read."""
+
+
+def _conflict(model, pks):
+    name = model._meta.verbose_name.capitalize()
+    return ConflictError(
+        f"{name} {', '.join(str(pk) for pk in pks)} was changed by someone else. "
+        "Please reload and try again."
+    )
+
+
+def save_versioned(instance, fields, version_field, expected_version=None):
+    """Write `fields` of `instance` only if its version is still the same.
+
+    One `UPDATE ... WHERE pk = ... AND <version_field> = <expected>` that
+    also increments the version. `expected_version` defaults to the version
+    the instance was loaded with; pass the version a client sent to reject
+    edits made from stale data. Raises ConflictError if no row matched.
+    """
+    model = type(instance)
+    expected = (
+        getattr(instance, version_field)
+        if expected_version in (None, "")
+        else int(expected_version)
+    )
+    # pre_save() gives the value save() would write (and stores new files)
+    values = {
+        field: model._meta.get_field(field).pre_save(instance, False)
+        for field in fields
+    }
+
+    updated = model._default_manager.filter(
+        pk=instance.pk, **{version_field: expected}
+    ).update(**values, **{version_field: F(version_field) + 1})
+    if not updated:
+        raise _conflict(model, [instance.pk])
+    setattr(instance, version_field, expected + 1)
+
+
+def bulk_save_versioned(instances, fields, version_field):
+    """`save_versioned` for many instances of one model.
+
+    One UPDATE per UPDATE_BATCH_SIZE instances. Raises ConflictError
+    (without telling which) if any row had moved on; call inside
+    `transaction.atomic()` so the other rows are rolled back.
+    """
+    if not instances:
+        return
+    model = type(instances[0])
+    pk_name = model._meta.pk.attname
+
+    updated = 0
+    for batch in batched(instances):
+        unchanged = Q()
+        for instance in batch:
+            unchanged |= Q(
+                pk=instance.pk, **{version_field: getattr(instance, version_field)}
+            )
+        values = {
+            field: Case(
+                *[
+                    When(
+                        **{pk_name: instance.pk},
+                        then=Value(
+                            model._meta.get_field(field).pre_save(instance, False),
+                            output_field=model._meta.get_field(field),
+                        ),
+                    )
+                    for instance in batch
+                ],
+                output_field=model._meta.get_field(field),
+            )
+            for field in fields
+        }
+
+        updated += model._default_manager.filter(unchanged).update(
+            **values, **{version_field: F(version_field) + 1}
+        )
+    if updated != len(instances):
+        raise _conflict(model, [instance.pk for instance in instances])
+    for instance in instances:
+        setattr(instance, version_field, getattr(instance, version_field) + 1)
+
+
+def retry_on_conflict(operation, attempts=None, delay=None):
+    """Run `operation()` again, after a short pause, if it hits a conflict.
+
+    `operation` must read what it needs and open its own transaction, so a
+    retry starts over from fresh data. The ConflictError of the last attempt
+    is raised to the caller.
+    """
+    attempts = attempts or settings.CONFLICT_RETRY_ATTEMPTS
+    delay = settings.CONFLICT_RETRY_DELAY_SECONDS if delay is None else delay
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except ConflictError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay * (attempt + 1))
@@ -0,0 +1,210 @@
+import csv
+import io
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+
+from .models import Order, OrderItem, Product
+from .sales_rollup import shop_time_zone
+
+Dataset = namedtuple("Dataset", ["model", "columns", "date_field"])
+
+# Exported columns (the primary key first) and the order date that
+# `start`/`end` filter on
+DATASETS = {
+    "orders": Dataset(
+        Order,
+        (
+            "order_id",
+            "customer_id",
+            "order_date_created",
+            "order_status",
+            "order_amount",
+            "order_paid_amount",
+            "order_change",
+            "order_cashier",
+            "order_queue_number",
+        ),
+        "order_date_created",
+    ),
+    "order_items": Dataset(
+        OrderItem,
+        (
+            "order_item_id",
+            "order_id",
+            "product_id",
+            "product_price",
+            "discounted_price",
+            "order_item_quantity",
+        ),
+        "order__order_date_created",
+    ),
+    "products": Dataset(
+        Product,
+        (
+            "product_id",
+            "sub_category_id",
+            "product_name",
+            "product_type",
+            "product_brand",
+            "product_size",
+            "product_color",
+            "product_price",
+            "product_quantity",
+            "product_available",
+            "product_sold",
+            "product_added",
+        ),
+        None,
+    ),
+}
+FORMATS = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+
+class ExportError(Exception):
+    """Raised for an unknown dataset or format, or a missing pyarrow."""
+
+
+def dataset(name):
+    if name not in DATASETS:
+        raise ExportError(f"Unknown dataset {name!r}.")
+    return DATASETS[name]
+
+
+def file_name(name, file_format, start=None, end=None):
+    period = f"_{start or 'start'}_{end or 'end'}" if start or end else ""
+    return f"{name}{period}.{FORMATS[file_format]}"
+
+
+def export_chunks(name, start=None, end=None, chunk_size=None):
+    """Yield the rows of a dataset as lists of tuples, in primary key order.
+
+    `start` and `end` are business dates (inclusive) filtering orders and
+    order items by the date the order was created. Each chunk is read with
+    its own short keyset query (`pk > last`, up to EXPORT_CHUNK_SIZE rows)
+    rather than one long-lived cursor: on SQLite an open cursor holds the
+    read lock that the kiosk's commits wait for, so between chunks writes go
+    through, and memory stays at one chunk whatever the size of the history.
+    """
+    export = dataset(name)
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    pk = export.model._meta.pk.name
+
+    rows = export.model.objects.all()
+    if export.date_field and start:
+        rows = rows.filter(
+            **{
+                f"{export.date_field}__gte": datetime.combine(
+                    start, time.min, tzinfo=shop_time_zone()
+                )
+            }
+        )
+    if export.date_field and end:
+        rows = rows.filter(
+            **{
+                f"{export.date_field}__lt": datetime.combine(
+                    end + timedelta(days=1), time.min, tzinfo=shop_time_zone()
+                )
+            }
+        )
+    rows = rows.order_by(pk).values_list(*export.columns)
+
+    last = None
+    while True:
+        page = rows if last is None else rows.filter(**{f"{pk}__gt": last})
+        chunk = list(page[:chunk_size].iterator(chunk_size=chunk_size))
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1][0]
+
+
+def iter_csv(name, start=None, end=None):
+    """The dataset as CSV text, a header line and then one string per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(dataset(name).columns)
+    for chunk in export_chunks(name, start, end):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_csv(name, out, start=None, end=None):
+    """Write the dataset as UTF-8 CSV to the binary file `out`."""
+    for text in iter_csv(name, start, end):
+        out.write(text.encode("utf-8"))
+
+
+def _arrow_schema(pa, export):
+    types = {
+        "AutoField": pa.int64(),
+        "BigAutoField": pa.int64(),
+        "IntegerField": pa.int64(),
+        "BigIntegerField": pa.int64(),
+        "ForeignKey": pa.int64(),
+        "DateTimeField": pa.timestamp("us", tz="UTC"),
+    }
+    fields = []
+    for column in export.columns:
+        field = export.model._meta.get_field(column)
+        if field.get_internal_type() == "DecimalField":
+            arrow_type = pa.decimal128(field.max_digits, field.decimal_places)
+        else:
+            arrow_type = types.get(field.get_internal_type(), pa.string())
+        fields.append(pa.field(column, arrow_type, nullable=field.null))
+    return pa.schema(fields)
+
+
+def write_columnar(name, file_format, out, start=None, end=None):
+    """Write the dataset to the binary file `out` as Parquet or Arrow IPC.
+
+    Each chunk becomes one Arrow record batch (one Parquet row group), so
+    only a chunk is held in memory. Needs pyarrow.
+    """
+    try:
+        # Imported here so the backend still runs where pyarrow is missing
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError(
+            f"Exporting to {file_format} needs pyarrow; install it or use csv."
+        )
+
+    export = dataset(name)
+    schema = _arrow_schema(pa, export)
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(out, schema)
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+
+    try:
+        for chunk in export_chunks(name, start, end):
+            writer.write_batch(
+                pa.RecordBatch.from_arrays(
+                    [
+                        pa.array(values, type=field.type)
+                        for values, field in zip(zip(*chunk), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+    finally:
+        writer.close()
+
+
+def write_export(name, file_format, out, start=None, end=None):
+    """Write a dataset in `file_format` (csv, parquet or arrow) to `out`."""
+    dataset(name)
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown format {file_format!r}.")
+    if file_format == "csv":
+        write_csv(name, out, start, end)
+    else:
+        write_columnar(name, file_format, out, start, end)
@@ -0,0 +1,189 @@
+import threading
+import zoneinfo
+from collections import deque
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+def advance_period_counter(entity, period, size=1):
+    """Advance the `IdCounter` of an entity and period, creating it if needed.
+
+    Returns the counter's new value; the numbers `value - size` up to
+    `value - 1` belong to the caller.
+    """
+    model = apps.get_model("accounts", "IdCounter")
+    table = connection.ops.quote_name(model._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (entity, period, next_value) "
+            f"VALUES (%s, %s, %s) "
+            f"ON CONFLICT (entity, period) "
+            f"DO UPDATE SET next_value = next_value + %s "
+            f"RETURNING next_value",
+            [entity, period, size + 1, size],
+        )
+        return cursor.fetchone()[0]
+
+
+def business_date():
+    """Today's date in the shop's time zone, which every ID period follows."""
+    return timezone.localdate(timezone=zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE))
+
+
+class IdAllocator:
+    """Hands out "<year><month><counter>" IDs from blocks leased off a Next*Id row.
+
+    A lease is one UPDATE ... RETURNING that advances the counter by a whole
+    block, so inserting a row no longer needs its own read-modify-write of the
+    counter. Leftover IDs are only pooled once the lease has committed; if the
+    surrounding transaction rolls back, the counter rolls back with it and the
+    block is dropped instead of being handed out twice.
+    """
+
+    def __init__(self, name, counter_model, width):
+        self.name = name
+        self.counter_model = counter_model
+        self.width = width
+        self._pool = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def block_size(self):
+        return getattr(settings, "ID_ALLOCATOR_BLOCK_SIZES", {}).get(self.name, 1)
+
+    def next_id(self):
+        return self.allocate(1)[0]
+
+    def allocate(self, count):
+        """Return `count` new IDs, leasing at most one block from the database."""
+        if count <= 0:
+            return []
+
+        numbers = self._take_from_pool(self._pool, count)
+        if len(numbers) < count:
+            numbers += self._lease(self._pool, count - len(numbers))
+
+        today = business_date()
+        prefix = f"{today.year}{today.month:02}"
+        return [int(f"{prefix}{number:0{self.width}}") for number in numbers]
+
+    def _take_from_pool(self, pool, count):
+        taken = []
+        with self._lock:
+            while pool and len(taken) < count:
+                block = pool.popleft()
+                needed = count - len(taken)
+                taken.extend(block[:needed])
+                if len(block) > needed:
+                    pool.appendleft(block[needed:])
+        return taken
+
+    def _return_to_pool(self, pool, block):
+        with self._lock:
+            pool.append(block)
+
+    def _lease(self, pool, count, *key):
+        size = max(count, self.block_size)
+        end = self._advance_counter(size, *key)
+
+        block = range(end - size, end)
+        leftover = block[count:]
+        if leftover:
+            # Runs immediately in autocommit mode, otherwise after the outer commit
+            transaction.on_commit(lambda: self._return_to_pool(pool, leftover))
+        return list(block[:count])
+
+    def _advance_counter(self, size):
+        """Advance the counter by `size` and return its new value."""
+        model = apps.get_model("accounts", self.counter_model)
+        table = connection.ops.quote_name(model._meta.db_table)
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} SET next_id = next_id + %s "
+                    f"WHERE id = (SELECT MIN(id) FROM {table}) RETURNING next_id",
+                    [size],
+                )
+                row = cursor.fetchone()
+
+            if row is None:
+                # First ID ever for this entity
+                model.objects.create(next_id=size + 1)
+                return size + 1
+            return row[0]
+
+
+class PeriodIdAllocator(IdAllocator):
+    """Hands out fixed-width IDs whose counter restarts every month.
+
+    IDs are `yyyymm * 10**width + sequence`, so every ID of a month falls in a
+    contiguous integer range (see `id_range`) and sorts by month no matter how
+    many orders the shop has taken. Counters live in `IdCounter`, one row per
+    entity and month, created on first use by the same upsert that leases.
+    """
+
+    def __init__(self, name, width):
+        super().__init__(name, "IdCounter", width)
+        self._pools = {}
+
+    def allocate(self, count):
+        if count <= 0:
+            return []
+
+        # The shop's month, as for queue numbers and the sales rollups
+        today = business_date()
+        period = today.year * 100 + today.month
+        with self._lock:
+            pool = self._pools.setdefault(period, deque())
+            # Blocks of previous months can never be used again
+            for stale in [key for key in self._pools if key < period]:
+                del self._pools[stale]
+
+        numbers = self._take_from_pool(pool, count)
+        if len(numbers) < count:
+            numbers += self._lease(pool, count - len(numbers), period)
+
+        return [period * 10**self.width + number for number in numbers]
+
+    def _advance_counter(self, size, period):
+        end = advance_period_counter(self.name, period, size)
+
+        if end - 1 >= 10**self.width:
+            raise OverflowError(
+                f"{self.name} IDs for {period} exceed {10**self.width - 1}."
+            )
+        return end
+
+    def id_range(self, year, month=None):
+        """Return the inclusive (low, high) ID bounds of a year or a month."""
+        first = year * 100 + (month or 1)
+        last = year * 100 + (month or 12)
+        return first * 10**self.width, last * 10**self.width + 10**self.width - 1
+
+
+class DailySequence:
+    """Gap-free numbers that restart at 1 every business day.
+
+    Unlike the allocators, nothing is leased ahead: the counter is bumped in
+    the caller's transaction, so a rolled-back insert gives its number back.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def next_number(self):
+        period = int(business_date().strftime("%Y%m%d"))
+        return advance_period_counter(self.name, period) - 1
+
+
+sub_category_ids = IdAllocator("sub_category", "NextSubCategoryId", width=4)
+product_ids = IdAllocator("product", "NextProductId", width=7)
+customer_ids = IdAllocator("customer", "NextCustomerId", width=4)
+order_ids = PeriodIdAllocator("order", width=6)
+order_item_ids = IdAllocator("order_item", "NextOrderItemId", width=4)
+queue_numbers = DailySequence("queue_number")
@@ -0,0 +1,234 @@
+from django.db.models import Case, F, Q, Sum, Value, When
+
+from .concurrency import batched
+from .models import InventoryMovement, OrderItem, Product
+
+# How a movement of one unit changes (product_quantity, product_available)
+MOVEMENT_EFFECTS = {
+    "Reserve": (0, -1),
+    "Release": (0, 1),
+    "Sale": (-1, 0),
+    "Receive": (1, 1),
+    "Adjust": (1, 1),
+}
+
+
+class InsufficientStockError(Exception):
+    """Raised when a product does not have enough stock for a sale."""
+
+    def __init__(self, product_name, available, required):
+        self.product_name = product_name
+        self.available = available
+        self.required = required
+        super().__init__(
+            f"Insufficient stock for {product_name}. Available: {available}, Required: {required}."
+        )
+
+
+def required_quantities(order_items):
+    """Total quantity per product ID for a list of order items."""
+    required = {}
+    for item in order_items:
+        required[item.product_id] = (
+            required.get(item.product_id, 0) + item.order_item_quantity
+        )
+    return required
+
+
+def record_movements(kind, lines):
+    """Append ledger rows for `lines` of `(product_id, order_id, quantity)`.
+
+    Only writes the ledger; the caller updates the product counters.
+    """
+    on_hand, available = MOVEMENT_EFFECTS[kind]
+    InventoryMovement.objects.bulk_create(
+        InventoryMovement(
+            product_id=product_id,
+            order_id=order_id,
+            inventory_movement_kind=kind,
+            inventory_movement_on_hand=on_hand * quantity,
+            inventory_movement_available=available * quantity,
+        )
+        for product_id, order_id, quantity in lines
+        if quantity
+    )
+
+
+def _per_product(quantities):
+    return Case(
+        *[
+            When(product_id=product_id, then=Value(quantity))
+            for product_id, quantity in quantities.items()
+        ]
+    )
+
+
+def _take(quantities, field):
+    """Subtract `quantities` from `field` for rows that have enough of it.
+
+    One conditional UPDATE per UPDATE_BATCH_SIZE products. Raises
+    InsufficientStockError for the first product that did not have enough.
+    Call inside `transaction.atomic()` so a partial update is rolled back.
+    """
+    updated = 0
+    for batch in batched(quantities.items()):
+        batch = dict(batch)
+        enough = Q()
+        for product_id, quantity in batch.items():
+            enough |= Q(product_id=product_id, **{f"{field}__gte": quantity})
+
+        updates = {field: F(field) - _per_product(batch)}
+        if field == "product_quantity":
+            updates["product_sold"] = F("product_sold") + _per_product(batch)
+            updates["product_version"] = F("product_version") + 1
+
+        updated += Product.objects.filter(enough).update(**updates)
+    if updated == len(quantities):
+        return
+
+    # Report the first product that is short, as it is now in the database
+    for product in Product.objects.filter(product_id__in=quantities).order_by(
+        "product_id"
+    ):
+        if getattr(product, field) < quantities[product.product_id]:
+            raise InsufficientStockError(
+                product.product_name,
+                getattr(product, field),
+                quantities[product.product_id],
+            )
+    raise InsufficientStockError("an item", 0, 0)
+
+
+def reserve_stock(quantities, order_id):
+    """Set aside `{product_id: quantity}` for a pending order.
+
+    Checks and decrements product_available with one conditional UPDATE and
+    raises InsufficientStockError if any product does not have enough.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+    _take(quantities, "product_available")
+    record_movements(
+        "Reserve", [(pid, order_id, qty) for pid, qty in quantities.items()]
+    )
+
+
+def release_stock(quantities, order_id):
+    """Give `{product_id: quantity}` reserved by an order back to sale."""
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+    Product.objects.filter(product_id__in=quantities).update(
+        product_available=F("product_available") + _per_product(quantities)
+    )
+    record_movements(
+        "Release", [(pid, order_id, qty) for pid, qty in quantities.items()]
+    )
+
+
+def release_orders(order_ids):
+    """Release everything reserved by the given pending orders.
+
+    Reads the items with one grouped query and updates the products with
+    one UPDATE, however many orders are released.
+    """
+    lines = [
+        (row["product_id"], row["order_id"], row["quantity"])
+        for row in OrderItem.objects.filter(order_id__in=order_ids)
+        .values("order_id", "product_id")
+        .annotate(quantity=Sum("order_item_quantity"))
+    ]
+    totals = {}
+    for product_id, _, quantity in lines:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    totals = {pid: qty for pid, qty in totals.items() if qty}
+    if not totals:
+        return
+
+    Product.objects.filter(product_id__in=totals).update(
+        product_available=F("product_available") + _per_product(totals)
+    )
+    record_movements("Release", lines)
+
+
+def sell_stock(order_items):
+    """Take the items' quantities out of stock with one conditional UPDATE.
+
+    Every product row is only updated if it still has enough stock, so two
+    cashiers selling the last units cannot both succeed. If any product is
+    short, InsufficientStockError is raised; call this inside
+    `transaction.atomic()` so the rows that were updated are rolled back.
+    The items were reserved when their order was created, so a sale does
+    not change product_available.
+    """
+    required = required_quantities(order_items)
+    if not required:
+        return
+    _take(required, "product_quantity")
+
+    sold = {}
+    for item in order_items:
+        key = (item.product_id, item.order_id)
+        sold[key] = sold.get(key, 0) + item.order_item_quantity
+    record_movements(
+        "Sale",
+        [(product_id, order_id, qty) for (product_id, order_id), qty in sold.items()],
+    )
+
+
+def sell_more(quantities, order_id):
+    """Reserve and sell `{product_id: quantity}` more for a paid order.
+
+    The same two steps an order goes through at checkout and payment, so
+    the ledger and the counters match; raises InsufficientStockError if any
+    product does not have enough available. Call inside
+    `transaction.atomic()`.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+    reserve_stock(quantities, order_id)
+    _take(quantities, "product_quantity")
+    record_movements("Sale", [(pid, order_id, qty) for pid, qty in quantities.items()])
+
+
+def return_sold(quantities, order_id):
+    """Put `{product_id: quantity}` taken off a paid order back on sale.
+
+    Undoes `sell_more`: a Release and a negative Sale in the ledger.
+    """
+    quantities = {pid: qty for pid, qty in quantities.items() if qty}
+    if not quantities:
+        return
+    release_stock(quantities, order_id)
+    Product.objects.filter(product_id__in=quantities).update(
+        product_quantity=F("product_quantity") + _per_product(quantities),
+        product_sold=F("product_sold") - _per_product(quantities),
+        product_version=F("product_version") + 1,
+    )
+    record_movements("Sale", [(pid, order_id, -qty) for pid, qty in quantities.items()])
+
+
+def adjust_stock(product_id, change, kind="Adjust"):
+    """Add `change` (negative to remove) to a product's stock on hand.
+
+    Stock reserved by pending orders cannot be removed: a negative change
+    larger than product_available raises InsufficientStockError.
+    """
+    if not change:
+        return
+    products = Product.objects.filter(product_id=product_id)
+    if change < 0:
+        products = products.filter(product_available__gte=-change)
+    updated = products.update(
+        product_quantity=F("product_quantity") + change,
+        product_available=F("product_available") + change,
+        product_version=F("product_version") + 1,
+    )
+    if not updated and change < 0:
+        product = Product.objects.get(product_id=product_id)
+        raise InsufficientStockError(
+            product.product_name, product.product_available, -change
+        )
+    record_movements(kind, [(product_id, None, change)])
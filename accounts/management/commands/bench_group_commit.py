@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.checkout import create_pending_order
+from accounts.models import Log, Product
+from accounts.order_ingest import OrderGroupCommitter
+
+from ._scratch_db import scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare kiosk order ingestion throughput with and without group commit "
+        "on a scratch copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=400)
+        parser.add_argument("--kiosks", type=int, default=8)
+        parser.add_argument("--items", type=int, default=3)
+        parser.add_argument("--max-batch", type=int, default=50)
+        parser.add_argument("--max-wait-ms", type=float, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            # Make sure stock never runs out during the run
+            Product.objects.update(product_quantity=10**9, product_available=10**9)
+            products = list(Product.objects.values("product_id", "product_price"))
+            if not products:
+                self.stderr.write("The database has no products to order.")
+                return
+
+            carts = [
+                [
+                    {
+                        "product": {
+                            "product_id": product["product_id"],
+                            "product_price": product["product_price"],
+                        },
+                        "quantity": random.randint(1, 3),
+                    }
+                    for product in random.sample(
+                        products, min(options["items"], len(products))
+                    )
+                ]
+                for _ in range(options["orders"])
+            ]
+
+            self._report("direct", self._run(carts, options["kiosks"], self._direct))
+
+            committer = OrderGroupCommitter(
+                max_batch=options["max_batch"],
+                max_wait=options["max_wait_ms"] / 1000,
+            )
+            try:
+                self._report(
+                    "group commit",
+                    self._run(
+                        carts,
+                        options["kiosks"],
+                        lambda cart: committer.submit(cart, "bench").result(),
+                    ),
+                )
+            finally:
+                committer.stop()
+
+    def _direct(self, cart):
+        # Same work as create_order without group commit
+        with transaction.atomic():
+            order, _ = create_pending_order(cart)
+            Log.objects.create(
+                username="bench", action=f"Created a new order with ID {order.order_id}"
+            )
+        return order
+
+    def _run(self, carts, kiosks, place_order):
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+
+        def kiosk(index):
+            try:
+                for cart in carts[index::kiosks]:
+                    started = time.perf_counter()
+                    try:
+                        place_order(cart)
+                    except Exception as e:
+                        with lock:
+                            errors.append(e)
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=kiosk, args=(i,)) for i in range(kiosks)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, latencies, errors
+
+    def _report(self, label, result):
+        elapsed, latencies, errors = result
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        self.stdout.write(
+            f"{label:>12}: {len(latencies) / elapsed:8.1f} orders/s  "
+            f"p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  errors {len(errors)}"
+        )
+        if errors:
+            self.stdout.write(f"{'':>14}first error: {errors[0]}")
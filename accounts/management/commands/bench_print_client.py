@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.print_client import PrintClient
+from accounts.print_standin import StandInPrintServer
+
+
+SAMPLE_RECEIPT = {
+    "order_id": 202501000001,
+    "queue_number": 1,
+    "total": 450.0,
+    "items": [
+        {
+            "product": {
+                "product_id": 2024100000001 + index,
+                "product_name": f"Hex Bolt 5/16 x 3 1/2 #{index}",
+                "product_price": 15.0,
+                "product_color": "Silver",
+                "product_size": "5/16",
+            },
+            "quantity": 2,
+        }
+        for index in range(15)
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure print client throughput and latency against a local stand-in "
+        "print server: new connection per job, pooled connection, and pipelined."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=2000)
+        parser.add_argument("--pipeline", type=int, default=10)
+        parser.add_argument("--delay-ms", type=float, default=0)
+        parser.add_argument(
+            "--host",
+            help="Benchmark an already running print server instead of the stand-in.",
+        )
+        parser.add_argument("--port", type=int, default=8001)
+
+    def handle(self, *args, **options):
+        server = None
+        if options["host"]:
+            address = (options["host"], options["port"])
+        else:
+            server = StandInPrintServer(print_delay=options["delay_ms"] / 1000)
+            address = server.start()
+
+        jobs = options["jobs"]
+        try:
+
+            def per_job_connection():
+                client = PrintClient(*address, pool_size=0)
+                return [self._timed(lambda: client.print(SAMPLE_RECEIPT)) for _ in range(jobs)]
+
+            def pooled():
+                client = PrintClient(*address)
+                try:
+                    return [self._timed(lambda: client.print(SAMPLE_RECEIPT)) for _ in range(jobs)]
+                finally:
+                    client.close()
+
+            def pipelined():
+                client = PrintClient(*address)
+                size = options["pipeline"]
+                try:
+                    latencies = []
+                    for _ in range(0, jobs, size):
+                        elapsed = self._timed(
+                            lambda: client.print_many([SAMPLE_RECEIPT] * size)
+                        )
+                        latencies += [elapsed] * size
+                    return latencies
+                finally:
+                    client.close()
+
+            for label, run in (
+                ("connection per job", per_job_connection),
+                ("pooled", pooled),
+                (f"pipelined x{options['pipeline']}", pipelined),
+            ):
+                started = time.perf_counter()
+                latencies = sorted(run())
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:>20}: {len(latencies) / elapsed:9.1f} jobs/s  "
+                    f"p50 {latencies[len(latencies) // 2] * 1000:7.3f} ms  "
+                    f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.3f} ms"
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+    def _timed(self, func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Order, OrderItem, Product
+from accounts.rankings import rank_products
+from accounts.sales_rollup import (
+    rebuild_daily_sales,
+    rebuild_product_monthly_sales,
+    shop_time_zone,
+)
+
+from ._scratch_db import scratch_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the window-function product rankings with the former "
+        "query-per-month top selling report on a scratch copy of the database "
+        "filled with synthetic paid orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=20000)
+        parser.add_argument("--items", type=int, default=3)
+        parser.add_argument("--year", type=int, default=datetime.now().year)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            products = list(Product.objects.values("product_id", "product_price"))
+            if not products:
+                self.stderr.write("The database has no products to order.")
+                return
+
+            started = time.perf_counter()
+            self._fill(products, options["orders"], options["items"], options["year"])
+            self.stdout.write(
+                f"{options['orders']} synthetic orders written and rolled up in "
+                f"{time.perf_counter() - started:.1f} s"
+            )
+
+            year = options["year"]
+            self._report(
+                "12 queries",
+                lambda: self._query_per_month(year),
+                options["repeat"],
+            )
+            for period in ("month", "quarter", "week", "day"):
+                self._report(
+                    f"window {period}",
+                    lambda period=period: rank_products(
+                        year, period, threshold=20, limit=7
+                    ),
+                    options["repeat"],
+                )
+
+    def _fill(self, products, orders, items, year):
+        start = datetime(year, 1, 1, tzinfo=shop_time_zone())
+        seconds = int(
+            (datetime(year + 1, 1, 1, tzinfo=shop_time_zone()) - start).total_seconds()
+        )
+
+        # Bulk inserts bypass the ID allocators; continue after the highest IDs
+        next_order_id = (Order.objects.aggregate(top=Max("order_id"))["top"] or 0) + 1
+        next_item_id = (
+            OrderItem.objects.aggregate(top=Max("order_item_id"))["top"] or 0
+        ) + 1
+
+        with transaction.atomic():
+            new_orders = []
+            new_items = []
+            for order_id in range(next_order_id, next_order_id + orders):
+                amount = 0
+                for product in random.sample(products, min(items, len(products))):
+                    quantity = random.randint(1, 5)
+                    amount += product["product_price"] * quantity
+                    new_items.append(
+                        OrderItem(
+                            order_item_id=next_item_id,
+                            order_id=order_id,
+                            product_id=product["product_id"],
+                            product_price=product["product_price"],
+                            order_item_quantity=quantity,
+                        )
+                    )
+                    next_item_id += 1
+                new_orders.append(
+                    Order(
+                        order_id=order_id,
+                        order_amount=amount,
+                        order_paid_amount=amount,
+                        order_status="Paid",
+                        order_date_created=start
+                        + timedelta(seconds=random.randrange(seconds)),
+                    )
+                )
+            Order.objects.bulk_create(new_orders, batch_size=500)
+            OrderItem.objects.bulk_create(new_items, batch_size=500)
+
+        rebuild_daily_sales()
+        rebuild_product_monthly_sales()
+
+    def _query_per_month(self, year):
+        # The top selling report before rank_products: one grouped query per
+        # month plus one product lookup per row
+        rows = []
+        for month in range(1, 13):
+            monthly_sales = (
+                OrderItem.objects.filter(
+                    order__order_date_created__year=year,
+                    order__order_date_created__month=month,
+                )
+                .values("product_id")
+                .annotate(total_sold=Sum("order_item_quantity"))
+                .filter(total_sold__gte=20)
+                .order_by("-total_sold")[:7]
+            )
+            for product_data in monthly_sales:
+                product = Product.objects.get(pk=product_data["product_id"])
+                rows.append((month, product.product_name, product_data["total_sold"]))
+        return rows
+
+    def _report(self, label, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                rows = run()
+                timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"{label:>14}: median {statistics.median(timings) * 1000:8.1f} ms  "
+            f"{len(queries.captured_queries):3} queries  {len(rows):4} rows"
+        )
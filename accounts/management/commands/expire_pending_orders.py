@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.order_expiry import expire_pending_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Void pending orders older than the expiry age and release their "
+        "reserved stock. With --watch, keep doing so every "
+        "PENDING_ORDER_SWEEP_SECONDS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=settings.PENDING_ORDER_EXPIRY_MINUTES,
+            help="Age after which a pending order expires "
+            "(default: PENDING_ORDER_EXPIRY_MINUTES).",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Keep running and sweep every PENDING_ORDER_SWEEP_SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["minutes"]:
+            raise CommandError("No expiry age given and expiry is disabled.")
+        max_age = timedelta(minutes=options["minutes"])
+
+        if not options["watch"]:
+            expired = expire_pending_orders(max_age=max_age)
+            self.stdout.write(
+                self.style.SUCCESS(f"{expired} pending order(s) expired.")
+            )
+            return
+
+        try:
+            while True:
+                try:
+                    expired = expire_pending_orders(max_age=max_age)
+                    if expired:
+                        self.stdout.write(f"{expired} pending order(s) expired.")
+                except Exception as e:
+                    self.stderr.write(f"Could not expire pending orders: {e}")
+                finally:
+                    connection.close()
+                time.sleep(settings.PENDING_ORDER_SWEEP_SECONDS)
+        except KeyboardInterrupt:
+            pass
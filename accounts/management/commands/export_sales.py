@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from accounts.exports import DATASETS, FORMATS, ExportError, file_name, write_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export orders, order items and products, optionally limited to orders "
+        "created in a date range, to CSV, Parquet or Arrow IPC files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First order date (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Last order date (YYYY-MM-DD).")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument(
+            "--dataset",
+            choices=DATASETS,
+            action="append",
+            help="Dataset to export; repeat for several (default: all).",
+        )
+        parser.add_argument(
+            "--output", default=".", help="Directory to write the files to."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options["start"]) if options["start"] else None
+            end = parse_date(options["end"]) if options["end"] else None
+        except ValueError:
+            # Well formed but not a real date, e.g. 2024-02-30
+            start = end = None
+        if (options["start"] and start is None) or (options["end"] and end is None):
+            raise CommandError("Dates must be valid dates in YYYY-MM-DD format.")
+
+        os.makedirs(options["output"], exist_ok=True)
+        for name in options["dataset"] or DATASETS:
+            path = os.path.join(
+                options["output"], file_name(name, options["format"], start, end)
+            )
+            started = time.perf_counter()
+            written = False
+            try:
+                with open(path, "wb") as out:
+                    write_export(name, options["format"], out, start, end)
+                written = True
+            except ExportError as e:
+                raise CommandError(str(e))
+            finally:
+                # Leave no truncated export behind, whatever stopped it
+                if not written and os.path.exists(path):
+                    os.remove(path)
+            self.stdout.write(
+                f"{path}: {os.path.getsize(path)} bytes "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
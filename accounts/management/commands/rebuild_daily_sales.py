@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts.sales_rollup import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily sales rollup used by the dashboard from the paid "
+        "and voided orders."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_sales()
+        self.stdout.write(self.style.SUCCESS(f"{rows} daily sales row(s) written."))
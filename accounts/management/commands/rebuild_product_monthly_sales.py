@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.sales_rollup import rebuild_product_monthly_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the product-by-month sales rollup used by the top, low and "
+        "monthly products sold reports from the paid orders."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_product_monthly_sales()
+        self.stdout.write(
+            self.style.SUCCESS(f"{rows} product monthly sales row(s) written.")
+        )
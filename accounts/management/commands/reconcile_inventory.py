@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from accounts.models import InventoryMovement, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild product stock on hand and available-to-sell figures from the "
+        "inventory movement ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report products whose figures differ from the ledger.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            balances = {
+                row["product_id"]: row
+                for row in InventoryMovement.objects.values("product_id").annotate(
+                    on_hand=Sum("inventory_movement_on_hand"),
+                    available=Sum("inventory_movement_available"),
+                )
+            }
+
+            drifted = []
+            unbooked = 0
+            for product in Product.objects.only(
+                "product_id", "product_name", "product_quantity", "product_available"
+            ):
+                balance = balances.get(product.product_id)
+                if balance is None:
+                    # Never booked, e.g. created outside the API; leave as is
+                    unbooked += 1
+                    continue
+                if (
+                    product.product_quantity != balance["on_hand"]
+                    or product.product_available != balance["available"]
+                ):
+                    self.stdout.write(
+                        f"{product.product_id} {product.product_name}: "
+                        f"on hand {product.product_quantity} -> {balance['on_hand']}, "
+                        f"available {product.product_available} -> {balance['available']}"
+                    )
+                    product.product_quantity = balance["on_hand"]
+                    product.product_available = balance["available"]
+                    drifted.append(product)
+
+            if not options["dry_run"]:
+                Product.objects.bulk_update(
+                    drifted, ["product_quantity", "product_available"], batch_size=500
+                )
+
+        verb = "would be corrected" if options["dry_run"] else "corrected"
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(drifted)} product(s) {verb}.")
+        )
+        if unbooked:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{unbooked} product(s) have no ledger entries and were skipped."
+                )
+            )
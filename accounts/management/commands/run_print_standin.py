@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from accounts.print_standin import StandInPrintServer
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the RPi print server (framed protocol)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--delay-ms", type=float, default=0, help="Simulated time per receipt."
+        )
+
+    def handle(self, *args, **options):
+        server = StandInPrintServer(
+            options["host"], options["port"], options["delay_ms"] / 1000
+        )
+        self.stdout.write(f"Stand-in print server listening on {options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
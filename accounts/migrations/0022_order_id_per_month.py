@@ -0,0 +1,92 @@
+# Generated by Django 5.1 on 2026-10-18 08:44
+
+import zoneinfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+ORDER_ID_WIDTH = 6
+
+
+def renumber_orders(apps, schema_editor):
+    Order = apps.get_model("accounts", "Order")
+    OrderItem = apps.get_model("accounts", "OrderItem")
+    Feedback = apps.get_model("accounts", "Feedback")
+    IdCounter = apps.get_model("accounts", "IdCounter")
+
+    # Number orders 1, 2, 3... within the shop's month they were created in
+    shop_time_zone = zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE)
+    next_values = {}
+    for order in Order.objects.order_by("order_date_created", "order_id"):
+        created = timezone.localtime(order.order_date_created, shop_time_zone)
+        period = created.year * 100 + created.month
+        sequence = next_values.get(period, 1)
+        next_values[period] = sequence + 1
+
+        old_id = order.order_id
+        new_id = period * 10**ORDER_ID_WIDTH + sequence
+        Order.objects.filter(order_id=old_id).update(
+            order_id=new_id, order_legacy_id=old_id
+        )
+        OrderItem.objects.filter(order_id=old_id).update(order_id=new_id)
+        Feedback.objects.filter(order_id=old_id).update(order_id=new_id)
+
+    IdCounter.objects.bulk_create(
+        IdCounter(entity="order", period=period, next_value=next_value)
+        for period, next_value in next_values.items()
+    )
+
+
+def restore_legacy_order_ids(apps, schema_editor):
+    Order = apps.get_model("accounts", "Order")
+    OrderItem = apps.get_model("accounts", "OrderItem")
+    Feedback = apps.get_model("accounts", "Feedback")
+    IdCounter = apps.get_model("accounts", "IdCounter")
+
+    for order in Order.objects.exclude(order_legacy_id=None):
+        new_id = order.order_id
+        old_id = order.order_legacy_id
+        Order.objects.filter(order_id=new_id).update(order_id=old_id)
+        OrderItem.objects.filter(order_id=new_id).update(order_id=old_id)
+        Feedback.objects.filter(order_id=new_id).update(order_id=old_id)
+
+    IdCounter.objects.filter(entity="order").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_order_order_cashier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=50)),
+                ('period', models.IntegerField()),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='NextOrderId',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='order_legacy_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+        migrations.AddConstraint(
+            model_name='idcounter',
+            constraint=models.UniqueConstraint(fields=('entity', 'period'), name='unique_id_counter_period'),
+        ),
+        migrations.RunPython(renumber_orders, restore_legacy_order_ids),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_order_id_per_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_queue_number',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
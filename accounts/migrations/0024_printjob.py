@@ -0,0 +1,33 @@
+# Generated by Django 5.1 on 2026-10-18 08:46
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_order_order_queue_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('print_job_id', models.AutoField(primary_key=True, serialize=False)),
+                ('print_job_payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('print_job_status', models.CharField(choices=[('Pending', 'Pending'), ('Printing', 'Printing'), ('Printed', 'Printed'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('print_job_attempts', models.IntegerField(default=0)),
+                ('print_job_next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('print_job_last_error', models.TextField(blank=True, null=True)),
+                ('print_job_created', models.DateTimeField(auto_now_add=True)),
+                ('print_job_printed', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['print_job_status', 'print_job_next_attempt'], name='print_job_due_idx')],
+            },
+        ),
+    ]
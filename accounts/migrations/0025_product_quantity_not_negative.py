@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+def clamp_negative_stock(apps, schema_editor):
+    # Oversold products could have gone below zero before the constraint
+    Product = apps.get_model("accounts", "Product")
+    Product.objects.filter(product_quantity__lt=0).update(product_quantity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_printjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(condition=models.Q(('product_quantity__gte', 0)), name='product_quantity_not_negative'),
+        ),
+    ]
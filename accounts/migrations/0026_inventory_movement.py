@@ -0,0 +1,78 @@
+# Generated by Django 5.1 on 2026-10-18 08:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_inventory_ledger(apps, schema_editor):
+    # Opening balance per product, then a reservation for every pending order
+    Product = apps.get_model("accounts", "Product")
+    OrderItem = apps.get_model("accounts", "OrderItem")
+    InventoryMovement = apps.get_model("accounts", "InventoryMovement")
+
+    products = list(Product.objects.all())
+    movements = [
+        InventoryMovement(
+            product_id=product.product_id,
+            inventory_movement_kind="Adjust",
+            inventory_movement_on_hand=product.product_quantity,
+            inventory_movement_available=product.product_quantity,
+        )
+        for product in products
+    ]
+
+    reserved = {}
+    pending = (
+        OrderItem.objects.filter(order__order_status="Pending")
+        .values("order_id", "product_id")
+        .annotate(quantity=models.Sum("order_item_quantity"))
+    )
+    for row in pending:
+        reserved[row["product_id"]] = reserved.get(row["product_id"], 0) + row["quantity"]
+        movements.append(
+            InventoryMovement(
+                product_id=row["product_id"],
+                order_id=row["order_id"],
+                inventory_movement_kind="Reserve",
+                inventory_movement_available=-row["quantity"],
+            )
+        )
+    InventoryMovement.objects.bulk_create(movements, batch_size=500)
+
+    for product in products:
+        product.product_available = product.product_quantity - reserved.get(
+            product.product_id, 0
+        )
+    Product.objects.bulk_update(products, ["product_available"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_product_quantity_not_negative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='product_available',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('inventory_movement_id', models.AutoField(primary_key=True, serialize=False)),
+                ('inventory_movement_kind', models.CharField(choices=[('Reserve', 'Reserve'), ('Release', 'Release'), ('Sale', 'Sale'), ('Receive', 'Receive'), ('Adjust', 'Adjust')], max_length=10)),
+                ('inventory_movement_on_hand', models.IntegerField(default=0)),
+                ('inventory_movement_available', models.IntegerField(default=0)),
+                ('inventory_movement_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'inventory_movement_created'], name='inventory_movement_product_idx')],
+            },
+        ),
+        migrations.RunPython(open_inventory_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_inventory_movement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='product_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0027_order_product_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["order_status", "order_date_created"],
+                name="order_status_created_idx",
+            ),
+        ),
+    ]
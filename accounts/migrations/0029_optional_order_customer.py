@@ -0,0 +1,44 @@
+# Generated by Django 5.1 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def collapse_placeholder_customers(apps, schema_editor):
+    # Every order had its own empty Customer row; unlink and drop them all
+    Order = apps.get_model("accounts", "Order")
+    Customer = apps.get_model("accounts", "Customer")
+    Order.objects.update(customer=None)
+    Customer.objects.all().delete()
+
+
+def restore_placeholder_customers(apps, schema_editor):
+    # One placeholder per order again, dated like its order
+    Order = apps.get_model("accounts", "Order")
+    Customer = apps.get_model("accounts", "Customer")
+    next_id = (Customer.objects.aggregate(models.Max("customer_id"))["customer_id__max"] or 0) + 1
+    orders = list(Order.objects.filter(customer__isnull=True).order_by("order_id"))
+    customers = [
+        Customer(customer_id=next_id + index, date_created=order.order_date_created)
+        for index, order in enumerate(orders)
+    ]
+    Customer.objects.bulk_create(customers, batch_size=500)
+    for order, customer in zip(orders, customers):
+        order.customer_id = customer.customer_id
+    Order.objects.bulk_update(orders, ["customer"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_order_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.customer'),
+        ),
+        migrations.RunPython(collapse_placeholder_customers, restore_placeholder_customers),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.1 on 2026-10-18 09:06
+
+import zoneinfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_sales(apps, schema_editor):
+    # Paid and void orders per business day, as rebuild_daily_sales does
+    Order = apps.get_model("accounts", "Order")
+    OrderItem = apps.get_model("accounts", "OrderItem")
+    DailySales = apps.get_model("accounts", "DailySales")
+    shop_time_zone = zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE)
+
+    rows = {}
+    for row in (
+        Order.objects.filter(order_status__in=["Paid", "Void"])
+        .annotate(day=TruncDate("order_date_created", tzinfo=shop_time_zone))
+        .values("day", "order_status")
+        .annotate(orders=models.Count("order_id"), revenue=models.Sum("order_amount"))
+    ):
+        rows[(row["day"], row["order_status"])] = DailySales(
+            daily_sales_date=row["day"],
+            daily_sales_status=row["order_status"],
+            daily_sales_orders=row["orders"],
+            daily_sales_revenue=row["revenue"] or 0,
+        )
+
+    discount = models.ExpressionWrapper(
+        (models.F("product_price") - Coalesce("discounted_price", "product_price"))
+        * models.F("order_item_quantity"),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+    for row in (
+        OrderItem.objects.filter(order__order_status__in=["Paid", "Void"])
+        .annotate(day=TruncDate("order__order_date_created", tzinfo=shop_time_zone))
+        .values("day", "order__order_status")
+        .annotate(items=models.Sum("order_item_quantity"), discount=models.Sum(discount))
+    ):
+        sales = rows[(row["day"], row["order__order_status"])]
+        sales.daily_sales_items = row["items"] or 0
+        sales.daily_sales_discount = row["discount"] or 0
+
+    DailySales.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_optional_order_customer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('daily_sales_id', models.AutoField(primary_key=True, serialize=False)),
+                ('daily_sales_date', models.DateField()),
+                ('daily_sales_status', models.CharField(choices=[('Pending', 'Pending'), ('Paid', 'Paid'), ('Void', 'Void')], max_length=10)),
+                ('daily_sales_orders', models.IntegerField(default=0)),
+                ('daily_sales_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('daily_sales_items', models.IntegerField(default=0)),
+                ('daily_sales_discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('daily_sales_date', 'daily_sales_status'), name='daily_sales_date_status_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_sales, migrations.RunPython.noop),
+    ]
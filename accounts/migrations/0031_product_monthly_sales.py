@@ -0,0 +1,65 @@
+# Generated by Django 5.1 on 2026-10-18 09:07
+
+import zoneinfo
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def backfill_product_monthly_sales(apps, schema_editor):
+    # Paid quantity and revenue per product and business month, as
+    # rebuild_product_monthly_sales does
+    OrderItem = apps.get_model("accounts", "OrderItem")
+    ProductMonthlySales = apps.get_model("accounts", "ProductMonthlySales")
+
+    month = TruncMonth(
+        "order__order_date_created",
+        tzinfo=zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE),
+        output_field=models.DateField(),
+    )
+    revenue = models.ExpressionWrapper(
+        Coalesce("discounted_price", "product_price") * models.F("order_item_quantity"),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+    )
+    ProductMonthlySales.objects.bulk_create(
+        [
+            ProductMonthlySales(
+                product_id=row["product_id"],
+                product_monthly_sales_month=row["month"],
+                product_monthly_sales_quantity=row["quantity"],
+                product_monthly_sales_revenue=row["revenue"] or 0,
+            )
+            for row in OrderItem.objects.filter(order__order_status="Paid")
+            .annotate(month=month)
+            .values("product_id", "month")
+            .annotate(quantity=models.Sum("order_item_quantity"), revenue=models.Sum(revenue))
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_daily_sales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductMonthlySales',
+            fields=[
+                ('product_monthly_sales_id', models.AutoField(primary_key=True, serialize=False)),
+                ('product_monthly_sales_month', models.DateField()),
+                ('product_monthly_sales_quantity', models.IntegerField(default=0)),
+                ('product_monthly_sales_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_monthly_sales_month', 'product_monthly_sales_quantity'], name='product_monthly_sales_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'product_monthly_sales_month'), name='product_monthly_sales_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_product_monthly_sales, migrations.RunPython.noop),
+    ]
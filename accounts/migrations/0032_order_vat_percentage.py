@@ -0,0 +1,62 @@
+# Generated by Django 5.1 on 2026-10-18 09:41
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+CENT = Decimal('0.01')
+
+
+def backfill_vat_percentage(apps, schema_editor):
+    # The rate was not stored before; the current setting if it gives the
+    # amount the order was paid with, otherwise the rate the amount implies
+    Order = apps.get_model('accounts', 'Order')
+    OrderItem = apps.get_model('accounts', 'OrderItem')
+    VATSetting = apps.get_model('accounts', 'VATSetting')
+
+    setting = VATSetting.objects.first()
+    current = setting.vat_percentage if setting else Decimal('0')
+
+    line_total = models.ExpressionWrapper(
+        Coalesce('discounted_price', 'product_price') * models.F('order_item_quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+    subtotals = {
+        row['order_id']: Decimal(row['subtotal'] or 0).quantize(CENT, rounding=ROUND_HALF_UP)
+        for row in OrderItem.objects.filter(order__order_status='Paid')
+        .values('order_id')
+        .annotate(subtotal=models.Sum(line_total))
+    }
+
+    orders = []
+    for order in Order.objects.filter(order_status='Paid').only('order_id', 'order_amount'):
+        subtotal = subtotals.get(order.order_id, Decimal('0'))
+        vat_amount = (subtotal * current / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+        if subtotal + vat_amount == order.order_amount:
+            rate = current
+        elif subtotal > 0:
+            rate = ((order.order_amount - subtotal) * 100 / subtotal).quantize(CENT)
+            if not 0 <= rate < 1000:
+                continue
+        else:
+            continue
+        order.order_vat_percentage = rate
+        orders.append(order)
+    Order.objects.bulk_update(orders, ['order_vat_percentage'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_product_monthly_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_vat_percentage',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True),
+        ),
+        migrations.RunPython(backfill_vat_percentage, migrations.RunPython.noop),
+    ]
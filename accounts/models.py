@@ -4,6 +4,16 @@ from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .id_allocator import (
+    sub_category_ids,
+    product_ids,
+    customer_ids,
+    order_ids,
+    order_item_ids,
+    queue_numbers,
+)
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -51,6 +61,20 @@ class MainCategory(models.Model):
         return self.main_category_name
 
 
+class IdCounter(models.Model):
+    # One counter per entity and period (e.g. "order", 202501)
+    entity = models.CharField(max_length=50)
+    period = models.IntegerField()
+    next_value = models.BigIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["entity", "period"], name="unique_id_counter_period"
+            )
+        ]
+
+
 class NextSubCategoryId(models.Model):
     next_id = models.IntegerField(default=1)
 
@@ -69,18 +93,7 @@ class SubCategory(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.sub_category_id:
-            next_id = NextSubCategoryId.objects.first()
-            if next_id:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.sub_category_id = f"{year}{month:02}{next_id.next_id:04}"
-                next_id.next_id += 1
-                next_id.save()
-            else:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.sub_category_id = f"{year}{month:02}0001"
-                NextSubCategoryId.objects.create(next_id=2)
+            self.sub_category_id = sub_category_ids.next_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -100,23 +113,24 @@ class Product(models.Model):
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
     product_added = models.DateTimeField(auto_now_add=True)
     product_sold = models.IntegerField(default=0)
+    # Stock not reserved by pending orders, kept in step with InventoryMovement
+    product_available = models.IntegerField(default=0)
+    # Incremented on every edit and sale, for compare-and-swap updates
+    product_version = models.IntegerField(default=0)
 
     sub_category = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(product_quantity__gte=0),
+                name="product_quantity_not_negative",
+            )
+        ]
+
     def save(self, *args, **kwargs):
         if not self.product_id:
-            next_id = NextProductId.objects.first()
-            if next_id:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.product_id = f"{year}{month:02}{next_id.next_id:07}"
-                next_id.next_id += 1
-                next_id.save()
-            else:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.product_id = f"{year}{month:02}0000001"
-                NextProductId.objects.create(next_id=2)
+            self.product_id = product_ids.next_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -129,18 +143,7 @@ class Customer(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.customer_id:
-            next_id = NextCustomerId.objects.first()
-            if next_id:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.customer_id = f"{year}{month:02}{next_id.next_id:04}"
-                next_id.next_id += 1
-                next_id.save()
-            else:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.customer_id = f"{year}{month:02}0001"
-                NextCustomerId.objects.create(next_id=2)
+            self.customer_id = customer_ids.next_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -158,8 +161,11 @@ class Order(models.Model):
         ("Void", "Void"),
     )
 
-    order_id = models.AutoField(primary_key=True)
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    order_id = models.BigAutoField(primary_key=True)
+    # Kiosk orders are anonymous; only set when there is real customer data
+    customer = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, blank=True, null=True
+    )
     order_amount = models.DecimalField(max_digits=10, decimal_places=2)
     order_date_created = models.DateTimeField(default=timezone.now)
     order_status = models.CharField(
@@ -169,22 +175,31 @@ class Order(models.Model):
         max_digits=10, decimal_places=2, default=0.00
     )
     order_change = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    # VAT rate the order was paid with, so later edits keep charging it
+    order_vat_percentage = models.DecimalField(
+        max_digits=5, decimal_places=2, blank=True, null=True
+    )
     order_cashier = models.CharField(max_length=255, blank=True, null=True)
+    # Order ID printed on receipts before the per-month ID scheme
+    order_legacy_id = models.BigIntegerField(blank=True, null=True, db_index=True)
+    # Customer queue number, restarts every business day
+    order_queue_number = models.IntegerField(blank=True, null=True)
+    # Incremented on every update, for compare-and-swap updates
+    order_version = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["order_status", "order_date_created"],
+                name="order_status_created_idx",
+            )
+        ]
 
     def save(self, *args, **kwargs):
         if not self.order_id:
-            next_id = NextOrderId.objects.first()
-            if next_id:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.order_id = f"{year}{month:02}{next_id.next_id:04}"
-                next_id.next_id += 1
-                next_id.save()
-            else:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.order_id = f"{year}{month:02}0001"
-                NextOrderId.objects.create(next_id=2)
+            self.order_id = order_ids.next_id()
+            if self.order_queue_number is None:
+                self.order_queue_number = queue_numbers.next_number()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -215,32 +230,19 @@ class Feedback(models.Model):
         return f"Feedback {self.feedback_id} by Customer {self.customer_id}"
 
 
-class NextOrderId(models.Model):
-    next_id = models.IntegerField(default=1)
-
-
 class OrderItem(models.Model):
     order_item_id = models.AutoField(primary_key=True)
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     product_price = models.DecimalField(max_digits=10, decimal_places=2)
     order_item_quantity = models.IntegerField()
-    discounted_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    discounted_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )
 
     def save(self, *args, **kwargs):
         if not self.order_item_id:
-            next_id = NextOrderItemId.objects.first()
-            if next_id:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.order_item_id = f"{year}{month:02}{next_id.next_id:04}"
-                next_id.next_id += 1
-                next_id.save()
-            else:
-                year = timezone.now().year
-                month = timezone.now().month
-                self.order_item_id = f"{year}{month:02}0001"
-                NextOrderItemId.objects.create(next_id=2)
+            self.order_item_id = order_item_ids.next_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -250,9 +252,146 @@ class OrderItem(models.Model):
 class NextOrderItemId(models.Model):
     next_id = models.IntegerField(default=1)
 
+
+class PrintJob(models.Model):
+    PRINT_JOB_STATUS_CHOICES = (
+        ("Pending", "Pending"),
+        ("Printing", "Printing"),
+        ("Printed", "Printed"),
+        ("Failed", "Failed"),
+    )
+
+    print_job_id = models.AutoField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    print_job_payload = models.JSONField(encoder=DjangoJSONEncoder)
+    print_job_status = models.CharField(
+        max_length=10, choices=PRINT_JOB_STATUS_CHOICES, default="Pending"
+    )
+    print_job_attempts = models.IntegerField(default=0)
+    print_job_next_attempt = models.DateTimeField(default=timezone.now)
+    print_job_last_error = models.TextField(blank=True, null=True)
+    print_job_created = models.DateTimeField(auto_now_add=True)
+    print_job_printed = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["print_job_status", "print_job_next_attempt"],
+                name="print_job_due_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"Print Job {self.print_job_id} for Order {self.order_id}"
+
+
+class InventoryMovement(models.Model):
+    INVENTORY_MOVEMENT_KIND_CHOICES = (
+        ("Reserve", "Reserve"),
+        ("Release", "Release"),
+        ("Sale", "Sale"),
+        ("Receive", "Receive"),
+        ("Adjust", "Adjust"),
+    )
+
+    inventory_movement_id = models.AutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, blank=True, null=True)
+    inventory_movement_kind = models.CharField(
+        max_length=10, choices=INVENTORY_MOVEMENT_KIND_CHOICES
+    )
+    # Signed changes to product_quantity and product_available
+    inventory_movement_on_hand = models.IntegerField(default=0)
+    inventory_movement_available = models.IntegerField(default=0)
+    inventory_movement_created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "inventory_movement_created"],
+                name="inventory_movement_product_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_movement_kind} of Product {self.product_id}"
+
+
+class DailySales(models.Model):
+    """Settled orders rolled up per business day (SHOP_TIME_ZONE) and status.
+
+    Kept up to date by `accounts.sales_rollup` in the transactions that pay
+    and void orders; `manage.py rebuild_daily_sales` recomputes it.
+    """
+
+    daily_sales_id = models.AutoField(primary_key=True)
+    daily_sales_date = models.DateField()
+    daily_sales_status = models.CharField(
+        max_length=10, choices=Order.ORDER_STATUS_CHOICES
+    )
+    daily_sales_orders = models.IntegerField(default=0)
+    daily_sales_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+    daily_sales_items = models.IntegerField(default=0)
+    daily_sales_discount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["daily_sales_date", "daily_sales_status"],
+                name="daily_sales_date_status_unique",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.daily_sales_status} sales on {self.daily_sales_date}"
+
+
+class ProductMonthlySales(models.Model):
+    """Paid quantity and revenue per product and business month.
+
+    Kept up to date by `accounts.sales_rollup` alongside DailySales;
+    `manage.py rebuild_product_monthly_sales` recomputes it.
+    """
+
+    product_monthly_sales_id = models.AutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # First day of the month
+    product_monthly_sales_month = models.DateField()
+    product_monthly_sales_quantity = models.IntegerField(default=0)
+    product_monthly_sales_revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "product_monthly_sales_month"],
+                name="product_monthly_sales_unique",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=[
+                    "product_monthly_sales_month",
+                    "product_monthly_sales_quantity",
+                ],
+                name="product_monthly_sales_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"Sales of Product {self.product_id} in {self.product_monthly_sales_month:%Y-%m}"
+
+
 class VATSetting(models.Model):
-    vat_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=12.00)  # Default is 12% as per Philippine VAT
+    vat_percentage = models.DecimalField(
+        max_digits=5, decimal_places=2, default=12.00
+    )  # Default is 12% as per Philippine VAT
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"VAT: {self.vat_percentage}%"
\ No newline at end of file
+        return f"VAT: {self.vat_percentage}%"
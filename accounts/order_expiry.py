@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .concurrency import ConflictError, batched, retry_on_conflict
+from .inventory import release_orders
+from .models import Log, Order
+from .sales_rollup import book_orders
+
+EXPIRY_USERNAME = "system"
+
+
+def expire_pending_orders(max_age=None, now=None, batch_size=None):
+    """Void pending orders created more than `max_age` ago.
+
+    Works in batches of `batch_size` orders: each batch is voided in one
+    transaction (guarded by the orders' versions, so an order paid meanwhile
+    is left alone and the batch retried), its reserved stock is released and
+    a single Log row summarises it. Expired orders are booked as voids in
+    the daily sales rollup. Returns the number of expired orders.
+    """
+    max_age = max_age or timedelta(minutes=settings.PENDING_ORDER_EXPIRY_MINUTES)
+    batch_size = batch_size or settings.PENDING_ORDER_EXPIRY_BATCH
+    cutoff = (now or timezone.now()) - max_age
+
+    def expire_batch():
+        with transaction.atomic():
+            expired = list(
+                Order.objects.filter(
+                    order_status="Pending", order_date_created__lt=cutoff
+                )
+                .order_by("order_date_created")
+                .only(
+                    "order_id", "order_version", "order_date_created", "order_amount"
+                )[:batch_size]
+            )
+            if not expired:
+                return 0
+
+            updated = 0
+            for orders in batched(expired):
+                unchanged = Q()
+                for order in orders:
+                    unchanged |= Q(
+                        order_id=order.order_id, order_version=order.order_version
+                    )
+                updated += Order.objects.filter(unchanged).update(
+                    order_status="Void",
+                    order_version=F("order_version") + 1,
+                )
+            if updated != len(expired):
+                raise ConflictError("An expiring order was changed.")
+
+            order_ids = [order.order_id for order in expired]
+            release_orders(order_ids)
+            for order in expired:
+                order.order_status = "Void"
+            book_orders(expired)
+            Log.objects.create(
+                username=EXPIRY_USERNAME,
+                action=(
+                    f"Voided {len(order_ids)} pending order(s) older than "
+                    f"{int(max_age.total_seconds() // 60)} minutes "
+                    f"({order_ids[0]} to {order_ids[-1]})"
+                ),
+            )
+            return len(order_ids)
+
+    total = 0
+    while True:
+        expired = retry_on_conflict(expire_batch)
+        total += expired
+        if expired < batch_size:
+            return total
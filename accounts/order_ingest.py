@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .checkout import create_pending_order
+from .models import Log
+
+
+class _OrderRequest:
+    def __init__(self, cart_items, username):
+        self.cart_items = cart_items
+        self.username = username
+        self.future = Future()
+
+
+class OrderGroupCommitter:
+    """Writes kiosk orders from many requests in shared transactions.
+
+    Each SQLite write transaction takes the database lock, so concurrent
+    kiosks posting orders end up waiting on each other. Requests submitted
+    here are queued instead; a single committer thread collects whatever
+    arrives within `max_wait` seconds (up to `max_batch` orders) and writes
+    them, together with their `Log` rows, in one transaction. Every order
+    gets its own savepoint so a bad cart only fails its own request.
+    """
+
+    def __init__(self, max_batch=None, max_wait=None):
+        self.max_batch = max_batch or getattr(
+            settings, "ORDER_GROUP_COMMIT_MAX_BATCH", 50
+        )
+        self.max_wait = (
+            max_wait
+            if max_wait is not None
+            else getattr(settings, "ORDER_GROUP_COMMIT_MAX_WAIT_MS", 5) / 1000
+        )
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, cart_items, username):
+        """Queue an order and return a Future resolving to the committed Order.
+
+        The Future can be cancelled until the committer picks the order up;
+        after that the order is written whatever the caller does.
+        """
+        self._ensure_started()
+        request = _OrderRequest(cart_items, username)
+        self._queue.put(request)
+        return request.future
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="order-group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+
+                batch = [first]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        request = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+
+                # Requests whose caller gave up while queued are dropped here;
+                # the rest can no longer be cancelled
+                batch = [
+                    request
+                    for request in batch
+                    if request.future.set_running_or_notify_cancel()
+                ]
+                if batch:
+                    self._commit(batch)
+        finally:
+            connection.close()
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with transaction.atomic():
+                logs = []
+                for request in batch:
+                    try:
+                        with transaction.atomic():
+                            order, _ = create_pending_order(request.cart_items)
+                    except Exception as e:
+                        results.append((request, None, e))
+                        continue
+
+                    logs.append(
+                        Log(
+                            username=request.username,
+                            action=f"Created a new order with ID {order.order_id}",
+                        )
+                    )
+                    results.append((request, order, None))
+
+                Log.objects.bulk_create(logs)
+        except Exception as e:
+            # The whole batch was rolled back
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        for request, order, error in results:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(order)
+
+
+order_committer = OrderGroupCommitter()
@@ -0,0 +1,215 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .clock import shop_clock
+from .concurrency import bulk_save_versioned
+from .inventory import required_quantities, sell_stock
+from .models import Log, Order, OrderItem
+from .pricing import order_totals, vat_cache
+from .receipt_printer import receipt_printer
+from .sales_rollup import book_orders
+
+
+def payment_totals(items, amount_given, vat_percentage=None):
+    """Return (Totals, change) for paying `items` with `amount_given`.
+
+    Uses the discounted item prices and, unless given, the shop's VAT
+    setting.
+    """
+    breakdown = order_totals(items, vat_percentage)
+    return breakdown, amount_given - breakdown.total
+
+
+def receipt_data(order, items, subtotal, vat_percentage, cashier_name):
+    """Data for the POS receipt of a paid order."""
+    return {
+        "items": [
+            {
+                "product": {
+                    "product_id": item.product.product_id,
+                    "product_name": item.product.product_name,
+                    "product_price": float(item.product.product_price),
+                },
+                "quantity": item.order_item_quantity,
+                "color": item.product.product_color,
+                "size": item.product.product_size,
+            }
+            for item in items
+        ],
+        "subtotal": float(subtotal),  # Include subtotal
+        "total": float(order.order_amount),  # Total after VAT
+        "order_id": order.order_id,
+        "order_status": order.order_status,
+        "paid_amount": float(order.order_paid_amount),
+        "change": float(order.order_change),
+        "cashier": cashier_name,
+        "vat_percentage": float(vat_percentage),  # Include VAT percentage
+        "printed_at": shop_clock.now().isoformat(),
+    }
+
+
+def settle_orders(payments, cashier, cashier_name, username):
+    """Pay many pending orders in one transaction.
+
+    `payments` is a list of `{"order_id": ..., "order_paid_amount": ...}`;
+    VAT comes from the shop's setting. Orders that are missing,
+    not pending, underpaid or short on stock are skipped and reported; the
+    others are paid together: the orders and their items are read with two
+    queries, stock is taken with conditional UPDATEs and the orders are
+    saved with versioned UPDATEs (one per UPDATE_BATCH_SIZE rows), booked
+    in the daily sales rollup and the log rows written with one
+    `bulk_create`.
+    Receipts are queued to the POS printer in request order once the
+    transaction has committed.
+
+    Returns one `{"order_id", "success", ...}` outcome per payment, in
+    request order. Raises InsufficientStockError or ConflictError (and rolls
+    everything back) only if stock or an order changed between the check and
+    the update.
+    """
+    outcomes = []
+    accepted = []
+
+    vat_percentage = vat_cache.percentage()
+
+    with transaction.atomic():
+        order_ids = []
+        for payment in payments:
+            try:
+                order_ids.append(int(payment["order_id"]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        orders = Order.objects.prefetch_related(
+            Prefetch(
+                "orderitem_set", queryset=OrderItem.objects.select_related("product")
+            )
+        ).in_bulk(order_ids)
+
+        # Stock left for this batch, from the products loaded with the items
+        stock = {}
+        for order in orders.values():
+            for item in order.orderitem_set.all():
+                stock[item.product_id] = item.product.product_quantity
+
+        seen = set()
+        for payment in payments:
+            if not isinstance(payment, dict):
+                outcomes.append(
+                    {"order_id": None, "success": False, "error": "Invalid payment."}
+                )
+                continue
+
+            order_id = payment.get("order_id")
+            try:
+                order = orders.get(int(order_id))
+                amount_given = Decimal(str(payment["order_paid_amount"]))
+                if not amount_given.is_finite():
+                    raise ValueError(amount_given)
+            except (KeyError, TypeError, ValueError, InvalidOperation):
+                outcomes.append(
+                    {
+                        "order_id": order_id,
+                        "success": False,
+                        "error": "Invalid payment.",
+                    }
+                )
+                continue
+
+            error = None
+            if order is None:
+                error = "Order not found."
+            elif order.order_id in seen:
+                error = "Order appears more than once in the batch."
+            elif order.order_status != "Pending":
+                error = f"Order is already {order.order_status}."
+
+            if error is None:
+                items = list(order.orderitem_set.all())
+                breakdown, change = payment_totals(items, amount_given, vat_percentage)
+                if change < 0:
+                    error = "Insufficient amount provided."
+
+            if error is None:
+                for product_id, quantity in required_quantities(items).items():
+                    if stock[product_id] < quantity:
+                        product = next(
+                            item.product
+                            for item in items
+                            if item.product_id == product_id
+                        )
+                        error = f"Insufficient stock for {product.product_name}. Available: {stock[product_id]}, Required: {quantity}."
+                        break
+
+            if error is not None:
+                outcomes.append(
+                    {"order_id": order_id, "success": False, "error": error}
+                )
+                continue
+
+            seen.add(order.order_id)
+            for product_id, quantity in required_quantities(items).items():
+                stock[product_id] -= quantity
+
+            order.order_status = "Paid"
+            order.order_paid_amount = amount_given
+            order.order_change = change
+            order.order_amount = breakdown.total  # Update to total amount after VAT
+            order.order_vat_percentage = breakdown.vat_percentage
+            order.order_cashier = cashier
+            accepted.append((order, items, breakdown.subtotal))
+            outcomes.append(
+                {
+                    "order_id": order.order_id,
+                    "success": True,
+                    "total": float(breakdown.total),
+                    "change": float(change),
+                }
+            )
+
+        if not accepted:
+            return outcomes
+
+        sell_stock([item for _, items, _ in accepted for item in items])
+        # Compare-and-swap UPDATEs; any order changed since it was read
+        # raises ConflictError and rolls the whole batch back
+        bulk_save_versioned(
+            [order for order, _, _ in accepted],
+            [
+                "order_status",
+                "order_paid_amount",
+                "order_change",
+                "order_amount",
+                "order_vat_percentage",
+                "order_cashier",
+            ],
+            "order_version",
+        )
+        book_orders([order for order, _, _ in accepted])
+        Log.objects.bulk_create(
+            [
+                Log(username=username, action=f"Paid for order {order.order_id}")
+                for order, _, _ in accepted
+            ]
+        )
+
+        receipts = [
+            receipt_data(order, items, subtotal, vat_percentage, cashier_name)
+            for order, items, subtotal in accepted
+        ]
+        transaction.on_commit(lambda: queue_receipts(receipts))
+
+    return outcomes
+
+
+def queue_receipts(receipts):
+    """Hand receipts to the POS printer worker, which prints them in order."""
+    for print_data in receipts:
+        future = receipt_printer.submit(print_data)
+        future.add_done_callback(_report_print_failure)
+
+
+def _report_print_failure(future):
+    if future.exception() is not None:
+        print(f"Error printing receipt: {future.exception()}")
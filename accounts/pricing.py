@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import OrderItem, VATSetting
+
+CENT = Decimal("0.01")
+
+Totals = namedtuple("Totals", ["subtotal", "vat_percentage", "vat_amount", "total"])
+
+
+def to_cents(amount):
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class VATCache:
+    """Process-wide copy of the VAT setting.
+
+    Reading VAT used to cost a query per request. The setting is loaded
+    once and kept until `invalidate()` is called (VATSettingView.put does),
+    or for at most VAT_CACHE_SECONDS so other worker processes also pick up
+    a change.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._setting = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def setting(self):
+        """The VATSetting row, or None if VAT was never configured."""
+        max_age = (
+            self.max_age if self.max_age is not None else settings.VAT_CACHE_SECONDS
+        )
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > max_age:
+                self._setting = VATSetting.objects.first()
+                self._loaded_at = time.monotonic()
+            return self._setting
+
+    def percentage(self):
+        setting = self.setting()
+        return setting.vat_percentage if setting else Decimal("0")
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+vat_cache = VATCache()
+
+
+def line_price(item):
+    """Unit price of an order item, after its discount if it has one."""
+    if item.discounted_price is not None:
+        return item.discounted_price
+    return item.product_price
+
+
+def order_subtotal(items):
+    """Sum of the order items at their (discounted) prices."""
+    return sum(
+        (line_price(item) * item.order_item_quantity for item in items), Decimal("0")
+    )
+
+
+def stored_order_subtotal(order_id):
+    """`order_subtotal` of an order's saved items, as one SQL aggregate."""
+    subtotal = OrderItem.objects.filter(order_id=order_id).aggregate(
+        subtotal=Sum(
+            ExpressionWrapper(
+                Coalesce("discounted_price", "product_price")
+                * F("order_item_quantity"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+    )["subtotal"]
+    return to_cents(subtotal or 0)
+
+
+def totals(subtotal, vat_percentage=None):
+    """Subtotal, VAT and total in cents; VAT is added on top of the subtotal."""
+    if vat_percentage is None:
+        vat_percentage = vat_cache.percentage()
+    subtotal = to_cents(subtotal)
+    vat_amount = to_cents(subtotal * vat_percentage / 100)
+    return Totals(subtotal, vat_percentage, vat_amount, subtotal + vat_amount)
+
+
+def order_totals(items, vat_percentage=None):
+    return totals(order_subtotal(items), vat_percentage)
@@ -0,0 +1,169 @@
+import json
+import socket
+import struct
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+# Every message is a 4-byte big-endian length followed by that many bytes of
+# UTF-8 JSON. Requests look like {"type": "print" | "ping", "job_id": ...,
+# "payload": {...}}; the server answers each one, in order, with
+# {"job_id": ..., "status": "ok" | "error", "message": ...}.
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 1024 * 1024
+
+
+class PrintServerError(Exception):
+    """Raised when the print server cannot be reached or rejects a job."""
+
+
+def encode_frame(message):
+    body = json.dumps(message).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def read_frame(stream):
+    """Read one frame from a binary file object, or return None at EOF."""
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise PrintServerError("Connection closed in the middle of a frame.")
+
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise PrintServerError(f"Frame of {length} bytes is too large.")
+
+    body = stream.read(length)
+    if len(body) < length:
+        raise PrintServerError("Connection closed in the middle of a frame.")
+    return json.loads(body.decode("utf-8"))
+
+
+class _Connection:
+    def __init__(self, address, timeout):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile("rb")
+        self.last_used = time.monotonic()
+
+    def exchange(self, messages):
+        """Send all messages in one write, then collect their acknowledgements."""
+        self.sock.sendall(b"".join(encode_frame(message) for message in messages))
+
+        acks = {}
+        while len(acks) < len(messages):
+            ack = read_frame(self.stream)
+            if ack is None:
+                raise PrintServerError("Print server closed the connection.")
+            acks[ack.get("job_id")] = ack
+
+        self.last_used = time.monotonic()
+        return [acks.get(message["job_id"]) for message in messages]
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class PrintClient:
+    """Pooled, persistent client for the RPi print server.
+
+    Connections are reused between receipts instead of paying TCP setup for
+    every job. A connection that sat idle for longer than
+    `health_check_after` seconds is pinged before use and replaced if it no
+    longer answers. `print_many` pipelines several jobs on one connection.
+    """
+
+    def __init__(
+        self, host, port, pool_size=2, timeout=10, health_check_after=30
+    ):
+        self.address = (host, port)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def print(self, payload, job_id=None):
+        return self.print_many([payload], [job_id])[0]
+
+    def print_many(self, payloads, job_ids=None):
+        """Send several print jobs and return their acknowledgements in order."""
+        job_ids = job_ids or [None] * len(payloads)
+        messages = [
+            {
+                "type": "print",
+                "job_id": str(job_id) if job_id is not None else uuid.uuid4().hex,
+                "payload": payload,
+            }
+            for payload, job_id in zip(payloads, job_ids)
+        ]
+
+        connection = self._acquire()
+        try:
+            acks = connection.exchange(messages)
+        except (OSError, ValueError, PrintServerError) as e:
+            connection.close()
+            raise PrintServerError(f"Print server unavailable: {e}") from e
+
+        self._release(connection)
+        return [
+            ack
+            or {
+                "job_id": message["job_id"],
+                "status": "error",
+                "message": "No acknowledgement received.",
+            }
+            for message, ack in zip(messages, acks)
+        ]
+
+    def ping(self):
+        connection = self._acquire()
+        self._release(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+
+            if connection is None:
+                try:
+                    return _Connection(self.address, self.timeout)
+                except OSError as e:
+                    raise PrintServerError(f"Print server unavailable: {e}") from e
+
+            if time.monotonic() - connection.last_used < self.health_check_after:
+                return connection
+            if self._is_healthy(connection):
+                return connection
+            connection.close()
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _is_healthy(self, connection):
+        try:
+            (ack,) = connection.exchange([{"type": "ping", "job_id": "ping"}])
+        except (OSError, ValueError, PrintServerError):
+            return False
+        return ack is not None and ack.get("status") == "ok"
+
+
+print_client = PrintClient(settings.PRINT_SERVER_HOST, settings.PRINT_SERVER_PORT)
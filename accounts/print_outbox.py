@@ -0,0 +1,156 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import PrintJob
+from .print_client import print_client
+
+
+def enqueue_print_job(order, payload):
+    """Record a receipt to print in the caller's transaction.
+
+    The dispatcher is only woken once the transaction commits, so the printer
+    never sees an order that was rolled back and never holds the database
+    lock while it prints.
+    """
+    job = PrintJob.objects.create(order=order, print_job_payload=payload)
+    transaction.on_commit(print_dispatcher.notify)
+    return job
+
+
+class PrintDispatcher:
+    """Background thread delivering `PrintJob` rows to the print server.
+
+    Failed deliveries are retried with exponential backoff until
+    PRINT_JOB_MAX_ATTEMPTS is reached, after which the job is marked Failed.
+    The thread is started on the first `notify()` and then also picks up
+    jobs left over from before a restart. Errors outside a delivery, such as
+    a locked database, are logged and retried with the same backoff, and the
+    jobs claimed before the error are requeued; should the thread stop
+    anyway, the next `notify()` starts a new one.
+    """
+
+    def __init__(self, client=print_client):
+        self.client = client
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def notify(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="print-dispatcher", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        recovered = False
+        failures = 0
+        try:
+            while True:
+                try:
+                    if not recovered:
+                        # Jobs a previous process was printing when it stopped
+                        PrintJob.objects.filter(print_job_status="Printing").update(
+                            print_job_status="Pending"
+                        )
+                        recovered = True
+                    self._wake.clear()
+                    self.deliver_due_jobs()
+                    timeout = self._seconds_until_next_job()
+                    failures = 0
+                except Exception as e:
+                    # E.g. "database is locked"; keep the thread and try again
+                    print(f"Could not deliver print jobs: {e}")
+                    connection.close()
+                    # Jobs claimed before the error would otherwise stay
+                    # Printing; requeue them along with any left over
+                    recovered = False
+                    failures += 1
+                    timeout = min(
+                        settings.PRINT_JOB_RETRY_BASE_SECONDS * 2 ** (failures - 1),
+                        settings.PRINT_JOB_RETRY_MAX_SECONDS,
+                    )
+                self._wake.wait(timeout)
+        finally:
+            connection.close()
+            # Let the next notify() start a new thread
+            with self._lock:
+                self._thread = None
+
+    def deliver_due_jobs(self):
+        while True:
+            due_jobs = list(
+                PrintJob.objects.filter(
+                    print_job_status="Pending",
+                    print_job_next_attempt__lte=timezone.now(),
+                ).order_by("print_job_id")[: settings.PRINT_JOB_BATCH_SIZE]
+            )
+            if not due_jobs:
+                return
+
+            # Claim the jobs so another process cannot print them too
+            claimed_jobs = [
+                job
+                for job in due_jobs
+                if PrintJob.objects.filter(
+                    print_job_id=job.print_job_id, print_job_status="Pending"
+                ).update(print_job_status="Printing")
+            ]
+            if claimed_jobs:
+                self._deliver(claimed_jobs)
+
+    def _deliver(self, jobs):
+        # Pipelined on one connection, acknowledged per job
+        try:
+            acks = self.client.print_many(
+                [job.print_job_payload for job in jobs],
+                [job.print_job_id for job in jobs],
+            )
+        except Exception as e:
+            for job in jobs:
+                self._record_failure(job, e)
+            return
+
+        for job, ack in zip(jobs, acks):
+            if ack.get("status") == "ok":
+                PrintJob.objects.filter(print_job_id=job.print_job_id).update(
+                    print_job_status="Printed",
+                    print_job_attempts=job.print_job_attempts + 1,
+                    print_job_printed=timezone.now(),
+                    print_job_last_error=None,
+                )
+            else:
+                self._record_failure(job, ack.get("message") or "Printing failed")
+
+    def _record_failure(self, job, error):
+        attempts = job.print_job_attempts + 1
+        delay = min(
+            settings.PRINT_JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+            settings.PRINT_JOB_RETRY_MAX_SECONDS,
+        )
+        PrintJob.objects.filter(print_job_id=job.print_job_id).update(
+            print_job_status=(
+                "Failed" if attempts >= settings.PRINT_JOB_MAX_ATTEMPTS else "Pending"
+            ),
+            print_job_attempts=attempts,
+            print_job_next_attempt=timezone.now() + timedelta(seconds=delay),
+            print_job_last_error=str(error) or error.__class__.__name__,
+        )
+
+    def _seconds_until_next_job(self):
+        next_attempt = PrintJob.objects.filter(print_job_status="Pending").aggregate(
+            next_attempt=Min("print_job_next_attempt")
+        )["next_attempt"]
+        if next_attempt is None:
+            return None  # Sleep until notified
+        return max((next_attempt - timezone.now()).total_seconds(), 0)
+
+
+print_dispatcher = PrintDispatcher()
@@ -0,0 +1,52 @@
+import socket
+import socketserver
+import threading
+import time
+
+from .print_client import encode_frame, read_frame
+
+
+class _FrameHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                message = read_frame(self.rfile)
+            except Exception:
+                return
+            if message is None:
+                return
+
+            if message.get("type") == "print":
+                if self.server.print_delay:
+                    time.sleep(self.server.print_delay)
+                self.server.printed += 1
+                ack = {"status": "ok", "message": "Print job completed successfully"}
+            elif message.get("type") == "ping":
+                ack = {"status": "ok", "message": "pong"}
+            else:
+                ack = {"status": "error", "message": "Unknown message type"}
+
+            ack["job_id"] = message.get("job_id")
+            self.wfile.write(encode_frame(ack))
+
+
+class StandInPrintServer(socketserver.ThreadingTCPServer):
+    """Local stand-in for the RPi print server speaking the framed protocol.
+
+    It acknowledges every job after `print_delay` seconds without printing,
+    which is enough to measure client throughput and latency on Linux.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, print_delay=0):
+        super().__init__((host, port), _FrameHandler)
+        self.print_delay = print_delay
+        self.printed = 0
+
+    def start(self):
+        """Serve from a background thread and return the bound (host, port)."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
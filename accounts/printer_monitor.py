@@ -0,0 +1,105 @@
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def read_printer_status(printer_name):
+    """Query the Windows spooler once; returns (ready, status_code, message)."""
+    try:
+        # Imported here so the backend still starts where pywin32 is missing
+        import win32print
+
+        hprinter = win32print.OpenPrinter(printer_name)
+        try:
+            printer_info = win32print.GetPrinter(hprinter, 2)
+        finally:
+            win32print.ClosePrinter(hprinter)
+
+        # Check if the printer is ready
+        status = printer_info["Status"]
+
+        # Check for printer statuses
+        if status == 0:  # 0 indicates the printer is ready
+            return True, status, "Printer is ready."
+        elif (
+            status & win32print.PRINTER_STATUS_OFFLINE
+        ):  # Check if the printer is offline
+            return False, status, "Printer is offline."
+        elif status in (
+            1,
+            2,
+            3,
+            4,
+            5,
+        ):  # 1: paused, 2: error, 3: pending deletion, 4: paper jam, 5: other errors
+            return False, status, "Printer is not ready or has an issue."
+        else:
+            return False, status, "Printer is in an unknown state."
+    except Exception as e:
+        return False, None, f"Error checking printer status: {str(e)}"
+
+
+class PrinterMonitor:
+    """Polls the receipt printer in the background and caches the result.
+
+    Payments read the last known state instead of opening the printer and
+    querying the spooler synchronously. The thread starts on first use; the
+    very first caller waits briefly for the initial reading.
+    """
+
+    def __init__(self, printer_name=None, interval=None):
+        self.printer_name = printer_name
+        self.interval = interval
+        self._state = None
+        self._first_reading = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def state(self, wait=5):
+        """Return the last known printer state as a dict."""
+        self._ensure_started()
+        self._first_reading.wait(wait)
+        return self._state or {
+            "ready": False,
+            "status_code": None,
+            "message": "Printer status not checked yet.",
+            "checked_at": None,
+        }
+
+    def is_ready(self):
+        return self.state()["ready"]
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="printer-monitor", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._check()
+            time.sleep(self.interval or settings.PRINTER_STATUS_POLL_SECONDS)
+
+    def _check(self):
+        if settings.RECEIPT_PRINTER_BACKEND != "win32":
+            ready, status_code, message = True, None, "Not a spooler printer."
+        else:
+            ready, status_code, message = read_printer_status(
+                self.printer_name or settings.RECEIPT_PRINTER_NAME
+            )
+
+        # Replaced as a whole so readers never see a half-updated state
+        self._state = {
+            "ready": ready,
+            "status_code": status_code,
+            "message": message,
+            "checked_at": timezone.now(),
+        }
+        self._first_reading.set()
+
+
+printer_monitor = PrinterMonitor()
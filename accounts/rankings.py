@@ -0,0 +1,117 @@
+from datetime import datetime
+
+from django.db.models import DateField, F, Sum, Window
+from django.db.models.functions import (
+    RowNumber,
+    TruncDay,
+    TruncMonth,
+    TruncQuarter,
+    TruncWeek,
+)
+
+from .models import OrderItem, ProductMonthlySales
+from .pricing import to_cents
+from .sales_rollup import LINE_REVENUE, shop_time_zone
+
+PERIODS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+    "quarter": TruncQuarter,
+}
+METRICS = ("quantity", "revenue")
+DIRECTIONS = ("top", "bottom")
+
+# Product details returned with every ranked row
+PRODUCT_FIELDS = (
+    "product__product_name",
+    "product__product_image",
+    "product__product_type",
+    "product__product_color",
+    "product__product_size",
+)
+
+
+class RankingError(ValueError):
+    """Raised for an unknown period, metric or direction, or a bad limit."""
+
+
+def rank_products(
+    year, period="month", metric="quantity", direction="top", threshold=None, limit=7
+):
+    """Rank products by paid sales within each period of a business year.
+
+    `period` is one of PERIODS, `metric` one of METRICS and `direction`
+    "top" (best sellers first) or "bottom" (worst sellers first). With a
+    `threshold`, top rankings keep products whose metric is at least the
+    threshold and bottom rankings those below it. At most `limit` products
+    are kept per period.
+
+    Runs as a single statement: sales are grouped per product and period,
+    numbered with ROW_NUMBER() OVER (PARTITION BY period ...) and filtered
+    on that number. Months and quarters are read from ProductMonthlySales,
+    days and weeks from the paid order items. Returns dicts ordered by
+    period and rank.
+    """
+    if period not in PERIODS:
+        raise RankingError(f"Unknown period {period!r}.")
+    if metric not in METRICS:
+        raise RankingError(f"Unknown metric {metric!r}.")
+    if direction not in DIRECTIONS:
+        raise RankingError(f"Unknown direction {direction!r}.")
+    if limit < 1:
+        raise RankingError("The limit must be at least 1.")
+
+    if period in ("month", "quarter"):
+        sales = ProductMonthlySales.objects.filter(
+            product_monthly_sales_month__year=year
+        ).annotate(
+            period=PERIODS[period](
+                "product_monthly_sales_month", output_field=DateField()
+            )
+        )
+        quantity = Sum("product_monthly_sales_quantity")
+        revenue = Sum("product_monthly_sales_revenue")
+    else:
+        # Business year boundaries in the shop's time zone
+        start = datetime(year, 1, 1, tzinfo=shop_time_zone())
+        end = datetime(year + 1, 1, 1, tzinfo=shop_time_zone())
+        sales = OrderItem.objects.filter(
+            order__order_status="Paid",
+            order__order_date_created__gte=start,
+            order__order_date_created__lt=end,
+        ).annotate(
+            period=PERIODS[period](
+                "order__order_date_created",
+                tzinfo=shop_time_zone(),
+                output_field=DateField(),
+            )
+        )
+        quantity = Sum("order_item_quantity")
+        revenue = Sum(LINE_REVENUE)
+
+    # Voids can leave rollup rows with nothing sold
+    ranked = (
+        sales.values("period", "product_id", *PRODUCT_FIELDS)
+        .annotate(quantity=quantity, revenue=revenue)
+        .filter(quantity__gt=0)
+    )
+    if threshold is not None:
+        lookup = "gte" if direction == "top" else "lt"
+        ranked = ranked.filter(**{f"{metric}__{lookup}": threshold})
+
+    order = F(metric).desc() if direction == "top" else F(metric).asc()
+    rows = list(
+        ranked.annotate(
+            rank=Window(
+                RowNumber(),
+                partition_by=[F("period")],
+                order_by=[order, F("product_id").asc()],
+            )
+        )
+        .filter(rank__lte=limit)
+        .order_by("period", "rank")
+    )
+    for row in rows:
+        row["revenue"] = to_cents(row["revenue"])
+    return rows
@@ -0,0 +1,106 @@
+import socket
+
+from django.conf import settings
+
+
+class NullBackend:
+    """Discards receipts; useful for benchmarks and machines without a printer."""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.receipts = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self.receipts += 1
+
+    def close(self):
+        pass
+
+
+class FileBackend:
+    """Appends raw receipt bytes to a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def write(self, data):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SocketBackend:
+    """Sends raw ESC/POS bytes to a network printer (usually port 9100)."""
+
+    def __init__(self, host, port, timeout=10):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._sock = None
+
+    def write(self, data):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._sock.sendall(data)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class Win32PrinterBackend:
+    """Writes each receipt as one RAW document to a Windows printer.
+
+    The printer handle is opened on the first write and kept open until
+    `close()`.
+    """
+
+    def __init__(self, printer_name):
+        # Imported here so the backend module loads where pywin32 is missing
+        import win32print
+
+        self.win32print = win32print
+        self.printer_name = printer_name
+        self._handle = None
+
+    def write(self, data):
+        win32print = self.win32print
+        if self._handle is None:
+            self._handle = win32print.OpenPrinter(self.printer_name)
+
+        win32print.StartDocPrinter(self._handle, 1, ("Receipt", None, "RAW"))
+        try:
+            win32print.StartPagePrinter(self._handle)
+            win32print.WritePrinter(self._handle, data)
+            win32print.EndPagePrinter(self._handle)
+        finally:
+            win32print.EndDocPrinter(self._handle)
+
+    def close(self):
+        if self._handle is not None:
+            try:
+                self.win32print.ClosePrinter(self._handle)
+            finally:
+                self._handle = None
+
+
+def create_backend():
+    """Create the receipt output backend configured in settings."""
+    kind = settings.RECEIPT_PRINTER_BACKEND
+    if kind == "win32":
+        return Win32PrinterBackend(settings.RECEIPT_PRINTER_NAME)
+    if kind == "socket":
+        return SocketBackend(*settings.RECEIPT_PRINTER_SOCKET)
+    if kind == "file":
+        return FileBackend(settings.RECEIPT_PRINTER_FILE)
+    if kind == "null":
+        return NullBackend()
+    raise ValueError(f"Unknown receipt printer backend: {kind}")
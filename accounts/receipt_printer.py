@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+from .clock import shop_clock
+from .receipt_backends import create_backend
+from .receipt_renderer import ReceiptRenderer
+
+
+class ReceiptPrinterWorker:
+    """Long-lived thread printing POS receipts from a queue.
+
+    Spawning `python print_receiptPOS.py` per payment paid for interpreter
+    startup, imports and opening the printer on every receipt. The worker
+    renders each receipt into one buffer and hands it to an output backend
+    that stays open between jobs; the backend is only reopened after a
+    failed job. `submit()` returns a Future with the outcome.
+    """
+
+    def __init__(self, backend_factory=create_backend, renderer=None):
+        self.backend_factory = backend_factory
+        self.renderer = renderer or ReceiptRenderer()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, print_data):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="receipt-printer", daemon=True
+                )
+                self._thread.start()
+
+        future = Future()
+        self._queue.put((print_data, future))
+        return future
+
+    def _run(self):
+        backend = None
+        while True:
+            print_data, future = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                # Time of payment in shop time, set by pay_order
+                printed_at = print_data.get("printed_at")
+                printed_at = (
+                    datetime.fromisoformat(printed_at)
+                    if printed_at
+                    else shop_clock.now()
+                )
+
+                receipt = self.renderer.render(print_data, printed_at)
+                if backend is None:
+                    backend = self.backend_factory()
+                backend.write(receipt)
+            except Exception as e:
+                future.set_exception(e)
+                # The backend may be unusable after an error; reopen next time
+                if backend is not None:
+                    try:
+                        backend.close()
+                    except Exception:
+                        pass
+                    backend = None
+            else:
+                future.set_result(True)
+
+
+receipt_printer = ReceiptPrinterWorker()
@@ -0,0 +1,94 @@
+MAX_WIDTH = 32  # Adjusted width for a 58mm thermal printer
+CASH_DRAWER_KICK = b"\x1B\x70\x00\x19\xFA"  # ESC p 0 25 250
+SEPARATOR = "-" * MAX_WIDTH
+
+
+class ReceiptRenderer:
+    """Builds a complete ESC/POS receipt as a single byte string.
+
+    The header (including the cash drawer kick) and the footer never change,
+    so they are encoded once and reused; only the order-specific middle part
+    is formatted per receipt. The result is meant to be sent to the printer
+    in one write.
+    """
+
+    def __init__(self, width=MAX_WIDTH, encoding="utf-8"):
+        self.width = width
+        self.encoding = encoding
+        self.header = CASH_DRAWER_KICK + self._encode(
+            [
+                " Universal Auto Supply and Bolt".center(width),
+                "Center".center(width),
+                "Cagayan de Oro, Philippines".center(width),
+                "",
+                "",
+            ]
+        )
+        self.footer = self._encode(
+            [
+                "",
+                "",
+                "Thank you for your purchase!".center(width),
+                "",
+                "<" + "-" * (width - 2) + ">",
+                "Please note that this is not an".center(width),
+                "official receipt".center(width),
+                "<" + "-" * (width - 2) + ">",
+                "",
+                "Powered by KiosCorp".center(width),
+                "",
+                "",
+                "",
+                "",
+            ]
+        )
+
+    def render(self, print_data, printed_at):
+        """Return the receipt bytes for `print_data` printed at `printed_at`."""
+        return self.header + self._encode(self._body_lines(print_data, printed_at)) + self.footer
+
+    def _body_lines(self, print_data, printed_at):
+        lines = [
+            f"Cashier: {print_data.get('cashier', 'Unknown Cashier')}",
+            "POS: KiosCorp POS",
+            "",
+            f"Order ID: {print_data.get('order_id', 'Unknown Order ID')}",
+            f"Status: {print_data.get('order_status', 'Unknown Status')}",
+            f"Date: {printed_at.strftime('%a, %b %d, %Y')}",
+            f"Time: {printed_at.strftime('%I:%M %p')}",
+            "",
+            "Item Name          Qty    Price",
+            SEPARATOR,
+        ]
+
+        items = print_data.get("items", [])
+        for index, item in enumerate(items):
+            name = item["product"]["product_name"].ljust(19)[:19]
+            quantity = str(item["quantity"]).rjust(1)
+            price = float(item["product"]["product_price"])
+            lines.append(f"{name} {quantity}  {price:7.2f}")
+            lines.append(f"({item['color']},{item['size']})")
+
+            # Blank line between items, not after the last one
+            if index < len(items) - 1:
+                lines.append("")
+
+        total = float(print_data.get("total", 0.0))
+        subtotal = float(print_data.get("subtotal", 0.0))
+        vat_percentage = float(print_data.get("vat_percentage", 0))
+        vat_amount = subtotal * (vat_percentage / 100)
+
+        lines += [
+            SEPARATOR,
+            f"Subtotal:          {subtotal:11.2f}",
+            f"VAT {vat_percentage}%:         {vat_amount:11.2f}",
+            f"Total:             {total:11.2f}",
+            "",
+            "",
+            f"Cash: {float(print_data.get('paid_amount', 0.0)):.2f}",
+            f"Change: {float(print_data.get('change', 0.0)):.2f}",
+        ]
+        return lines
+
+    def _encode(self, lines):
+        return "".join(f"{line}\n" for line in lines).encode(self.encoding)
@@ -0,0 +1,253 @@
+import zoneinfo
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case,
+    Count,
+    DateField,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .concurrency import batched
+from .models import DailySales, Order, OrderItem, ProductMonthlySales
+
+# Pending orders are not rolled up; they count once paid or voided
+SETTLED_STATUSES = ("Paid", "Void")
+
+# Amount taken off an order item by its discounted price
+LINE_DISCOUNT = ExpressionWrapper(
+    (F("product_price") - Coalesce("discounted_price", "product_price"))
+    * F("order_item_quantity"),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+# Amount charged for an order item, before VAT
+LINE_REVENUE = ExpressionWrapper(
+    Coalesce("discounted_price", "product_price") * F("order_item_quantity"),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def shop_time_zone():
+    return zoneinfo.ZoneInfo(settings.SHOP_TIME_ZONE)
+
+
+def business_date(moment):
+    """The shop's calendar date at `moment`."""
+    return timezone.localdate(moment, timezone=shop_time_zone())
+
+
+def book_orders(orders, sign=1):
+    """Add settled `orders` to the sales rollups; `sign=-1` takes them out.
+
+    Orders count in DailySales under their current `order_status`, and paid
+    ones also in ProductMonthlySales; pending ones are skipped. To change a
+    settled order, take it out before the change and book it again
+    afterwards, in the same transaction. Costs one query for the item
+    figures, one UPDATE per business date and status touched and, for paid
+    orders, two or three queries for the product months (more beyond
+    UPDATE_BATCH_SIZE product months).
+    """
+    orders = [order for order in orders if order.order_status in SETTLED_STATUSES]
+    if not orders:
+        return
+
+    lines = {}
+    for row in (
+        OrderItem.objects.filter(order_id__in=[order.order_id for order in orders])
+        .values("order_id", "product_id")
+        .annotate(
+            items=Sum("order_item_quantity"),
+            discount=Sum(LINE_DISCOUNT),
+            revenue=Sum(LINE_REVENUE),
+        )
+    ):
+        lines.setdefault(row["order_id"], []).append(row)
+
+    changes = {}
+    product_changes = {}
+    for order in orders:
+        date = business_date(order.order_date_created)
+        key = (date, order.order_status)
+        count, revenue, items, discount = changes.get(
+            key, (0, Decimal("0"), 0, Decimal("0"))
+        )
+        count += sign
+        revenue += sign * Decimal(str(order.order_amount))
+        for line in lines.get(order.order_id, []):
+            items += sign * line["items"]
+            discount += sign * (line["discount"] or 0)
+            if order.order_status == "Paid":
+                product_key = (line["product_id"], date.replace(day=1))
+                quantity, line_revenue = product_changes.get(
+                    product_key, (0, Decimal("0"))
+                )
+                product_changes[product_key] = (
+                    quantity + sign * line["items"],
+                    line_revenue + sign * (line["revenue"] or 0),
+                )
+        changes[key] = (count, revenue, items, discount)
+
+    for (date, order_status), figures in changes.items():
+        _increment(date, order_status, *figures)
+    if product_changes:
+        _increment_product_months(product_changes)
+
+
+def _increment(date, order_status, count, revenue, items, discount):
+    row = DailySales.objects.filter(
+        daily_sales_date=date, daily_sales_status=order_status
+    )
+    increments = {
+        "daily_sales_orders": F("daily_sales_orders") + count,
+        "daily_sales_revenue": F("daily_sales_revenue") + revenue,
+        "daily_sales_items": F("daily_sales_items") + items,
+        "daily_sales_discount": F("daily_sales_discount") + discount,
+    }
+    if row.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(
+                daily_sales_date=date,
+                daily_sales_status=order_status,
+                daily_sales_orders=count,
+                daily_sales_revenue=revenue,
+                daily_sales_items=items,
+                daily_sales_discount=discount,
+            )
+    except IntegrityError:
+        # Another transaction opened the day first
+        row.update(**increments)
+
+
+def _increment_product_months(changes, retry=True):
+    """Apply `{(product_id, month): (quantity, revenue)}` increments.
+
+    Existing rows are found with one query on the products and months
+    involved and get one UPDATE with a CASE per UPDATE_BATCH_SIZE rows;
+    missing ones are added with one `bulk_create`.
+    """
+    existing = {
+        (product_id, month): pk
+        for pk, product_id, month in ProductMonthlySales.objects.filter(
+            product_id__in={product_id for product_id, _ in changes},
+            product_monthly_sales_month__in={month for _, month in changes},
+        ).values_list(
+            "product_monthly_sales_id", "product_id", "product_monthly_sales_month"
+        )
+        if (product_id, month) in changes
+    }
+
+    for rows in batched(existing.items()):
+
+        def per_row(position):
+            return Case(
+                *[
+                    When(
+                        product_monthly_sales_id=pk, then=Value(changes[key][position])
+                    )
+                    for key, pk in rows
+                ]
+            )
+
+        ProductMonthlySales.objects.filter(
+            product_monthly_sales_id__in=[pk for _, pk in rows]
+        ).update(
+            product_monthly_sales_quantity=F("product_monthly_sales_quantity")
+            + per_row(0),
+            product_monthly_sales_revenue=F("product_monthly_sales_revenue")
+            + per_row(1),
+        )
+
+    missing = [key for key in changes if key not in existing]
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            ProductMonthlySales.objects.bulk_create(
+                ProductMonthlySales(
+                    product_id=product_id,
+                    product_monthly_sales_month=month,
+                    product_monthly_sales_quantity=changes[product_id, month][0],
+                    product_monthly_sales_revenue=changes[product_id, month][1],
+                )
+                for product_id, month in missing
+            )
+    except IntegrityError:
+        if not retry:
+            raise
+        # Another transaction opened some of the months first; those rows
+        # exist now, so one more pass updates them
+        _increment_product_months({key: changes[key] for key in missing}, False)
+
+
+def rebuild_daily_sales():
+    """Recompute DailySales from the orders; returns the rows written."""
+    day = TruncDate("order_date_created", tzinfo=shop_time_zone())
+    item_day = TruncDate("order__order_date_created", tzinfo=shop_time_zone())
+
+    with transaction.atomic():
+        rows = {}
+        for row in (
+            Order.objects.filter(order_status__in=SETTLED_STATUSES)
+            .annotate(day=day)
+            .values("day", "order_status")
+            .annotate(orders=Count("order_id"), revenue=Sum("order_amount"))
+        ):
+            rows[(row["day"], row["order_status"])] = DailySales(
+                daily_sales_date=row["day"],
+                daily_sales_status=row["order_status"],
+                daily_sales_orders=row["orders"],
+                daily_sales_revenue=row["revenue"] or 0,
+            )
+
+        for row in (
+            OrderItem.objects.filter(order__order_status__in=SETTLED_STATUSES)
+            .annotate(day=item_day)
+            .values("day", "order__order_status")
+            .annotate(items=Sum("order_item_quantity"), discount=Sum(LINE_DISCOUNT))
+        ):
+            sales = rows[(row["day"], row["order__order_status"])]
+            sales.daily_sales_items = row["items"] or 0
+            sales.daily_sales_discount = row["discount"] or 0
+
+        DailySales.objects.all().delete()
+        DailySales.objects.bulk_create(rows.values(), batch_size=500)
+
+    return len(rows)
+
+
+def rebuild_product_monthly_sales():
+    """Recompute the product-by-month rollup; returns the rows written."""
+    month = TruncMonth(
+        "order__order_date_created", tzinfo=shop_time_zone(), output_field=DateField()
+    )
+
+    with transaction.atomic():
+        rows = [
+            ProductMonthlySales(
+                product_id=row["product_id"],
+                product_monthly_sales_month=row["month"],
+                product_monthly_sales_quantity=row["quantity"],
+                product_monthly_sales_revenue=row["revenue"] or 0,
+            )
+            for row in OrderItem.objects.filter(order__order_status="Paid")
+            .annotate(month=month)
+            .values("product_id", "month")
+            .annotate(quantity=Sum("order_item_quantity"), revenue=Sum(LINE_REVENUE))
+        ]
+
+        ProductMonthlySales.objects.all().delete()
+        ProductMonthlySales.objects.bulk_create(rows, batch_size=500)
+
+    return len(rows)
@@ -1,4 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
+from .concurrency import save_versioned
+from .inventory import InsufficientStockError, adjust_stock, record_movements
 from .models import (
     CustomUser,
     Log,
@@ -120,7 +123,47 @@ class ProductSerializer(serializers.ModelSerializer):
             "product_added",
             "sub_category",
             "product_sold",
+            "product_available",
+            "product_version",
         ]
+        read_only_fields = ["product_available", "product_version"]
+
+    def validate_product_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Quantity cannot be negative.")
+        return value
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            quantity = validated_data.get("product_quantity", 0)
+            product = super().create({**validated_data, "product_available": quantity})
+            record_movements("Receive", [(product.product_id, None, quantity)])
+        return product
+
+    def update(self, instance, validated_data):
+        # Stock edits go through the ledger as an adjustment instead of
+        # overwriting product_quantity and product_available
+        quantity = validated_data.pop("product_quantity", instance.product_quantity)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            # Fails with ConflictError if the product changed since it was
+            # read, or since the version the client sent
+            save_versioned(
+                instance,
+                list(validated_data),
+                "product_version",
+                self.initial_data.get("product_version"),
+            )
+            try:
+                adjust_stock(instance.product_id, quantity - instance.product_quantity)
+            except InsufficientStockError as e:
+                # Only stock that is not reserved by pending orders can go
+                raise serializers.ValidationError({"product_quantity": str(e)})
+        instance.refresh_from_db(
+            fields=["product_quantity", "product_available", "product_version"]
+        )
+        return instance
 
 
 class ProductWithSubCategorySerializer(serializers.ModelSerializer):
@@ -142,6 +185,8 @@ class ProductWithSubCategorySerializer(serializers.ModelSerializer):
             "product_added",
             "sub_category",  # Ensure this is included
             "product_sold",
+            "product_available",
+            "product_version",
         ]
 
 
@@ -196,6 +241,8 @@ class OrderSerializer(serializers.ModelSerializer):
             "order_change",
             "order_date_created",
             "order_status",
+            "order_queue_number",
+            "order_version",
             "order_items",
         ]
 
@@ -1,3 +1,894 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+import io
+import os
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .checkout import create_pending_order
+from .exports import ExportError
+from .id_allocator import IdAllocator, PeriodIdAllocator
+from .models import (
+    DailySales,
+    IdCounter,
+    InventoryMovement,
+    MainCategory,
+    NextOrderItemId,
+    Order,
+    OrderItem,
+    Product,
+    PrintJob,
+    ProductMonthlySales,
+    SubCategory,
+    VATSetting,
+)
+from .order_expiry import expire_pending_orders
+from .payments import payment_totals, receipt_data
+from .pricing import vat_cache
+from .receipt_renderer import ReceiptRenderer
+from .sales_rollup import rebuild_daily_sales, rebuild_product_monthly_sales
+from .views import convert_decimals_to_floats
+
+# Bytes the former per-line print_receiptPOS.py script sent to the printer
+OLD_HEADER = (
+    b"\x1bp\x00\x19\xfa"
+    b" Universal Auto Supply and Bolt \n"
+    b"             Center             \n"
+    b"  Cagayan de Oro, Philippines   \n"
+    b"\n"
+    b"\n"
+)
+OLD_FOOTER = (
+    b"\n"
+    b"\n"
+    b"  Thank you for your purchase!  \n"
+    b"\n"
+    b"<------------------------------>\n"
+    b"Please note that this is not an \n"
+    b"        official receipt        \n"
+    b"<------------------------------>\n"
+    b"\n"
+    b"      Powered by KiosCorp       \n"
+    b"\n"
+    b"\n"
+    b"\n"
+    b"\n"
+)
+
+
+class ReceiptRendererTests(SimpleTestCase):
+    def test_matches_old_layout_without_vat(self):
+        print_data = {
+            "items": [
+                {
+                    "product": {
+                        "product_id": 3,
+                        "product_name": "Lock Nut",
+                        "product_price": 12.75,
+                    },
+                    "quantity": 2,
+                    "color": "Silver",
+                    "size": "M10",
+                }
+            ],
+            "subtotal": 25.5,
+            "total": 25.5,
+            "order_id": 2024010008,
+            "order_status": "Paid",
+            "paid_amount": 30.0,
+            "change": 4.5,
+            "cashier": "Puerto",
+            "vat_percentage": 0.0,
+        }
+
+        receipt = ReceiptRenderer().render(print_data, datetime(2024, 1, 15, 9, 30))
+
+        self.assertEqual(
+            receipt,
+            OLD_HEADER + b"Cashier: Puerto\n"
+            b"POS: KiosCorp POS\n"
+            b"\n"
+            b"Order ID: 2024010008\n"
+            b"Status: Paid\n"
+            b"Date: Mon, Jan 15, 2024\n"
+            b"Time: 09:30 AM\n"
+            b"\n"
+            b"Item Name          Qty    Price\n"
+            b"--------------------------------\n"
+            b"Lock Nut            2    12.75\n"
+            b"(Silver,M10)\n"
+            b"--------------------------------\n"
+            b"Subtotal:                25.50\n"
+            b"VAT 0.0%:                0.00\n"
+            b"Total:                   25.50\n"
+            b"\n"
+            b"\n"
+            b"Cash: 30.00\n"
+            b"Change: 4.50\n" + OLD_FOOTER,
+        )
+
+    def test_matches_old_layout_for_missing_fields(self):
+        print_data = {
+            "items": [
+                {
+                    "product": {
+                        "product_id": 1,
+                        "product_name": "Hex Bolt",
+                        "product_price": 25.0,
+                    },
+                    "quantity": 1,
+                    "color": "Silver",
+                    "size": "M8",
+                }
+            ],
+            "subtotal": 25.0,
+            "total": 28.0,
+            "order_status": "Paid",
+            "paid_amount": 28.0,
+            "change": 0.0,
+            "vat_percentage": 12.0,
+        }
+
+        receipt = ReceiptRenderer().render(print_data, datetime(2024, 12, 31, 23, 59))
+
+        self.assertEqual(
+            receipt,
+            OLD_HEADER + b"Cashier: Unknown Cashier\n"
+            b"POS: KiosCorp POS\n"
+            b"\n"
+            b"Order ID: Unknown Order ID\n"
+            b"Status: Paid\n"
+            b"Date: Tue, Dec 31, 2024\n"
+            b"Time: 11:59 PM\n"
+            b"\n"
+            b"Item Name          Qty    Price\n"
+            b"--------------------------------\n"
+            b"Hex Bolt            1    25.00\n"
+            b"(Silver,M8)\n"
+            b"--------------------------------\n"
+            b"Subtotal:                25.00\n"
+            b"VAT 12.0%:                3.00\n"
+            b"Total:                   28.00\n"
+            b"\n"
+            b"\n"
+            b"Cash: 28.00\n"
+            b"Change: 0.00\n" + OLD_FOOTER,
+        )
+
+
+class PaidOrderReceiptTests(TestCase):
+    def setUp(self):
+        sub_category = SubCategory.objects.create(
+            sub_category_name="Bolts",
+            main_category=MainCategory.objects.create(main_category_name="Bolts"),
+        )
+        self.bolt = Product.objects.create(
+            product_name="Hex Bolt M8 x 40 Zinc Plated",
+            product_type="Bolt",
+            product_size="M8",
+            product_brand="Generic",
+            product_color="Silver",
+            product_price=Decimal("25.00"),
+            sub_category=sub_category,
+        )
+        self.washer = Product.objects.create(
+            product_name="Flat Washer",
+            product_type="Washer",
+            product_size="8mm",
+            product_brand="Generic",
+            product_color="Black",
+            product_price=Decimal("3.50"),
+            sub_category=sub_category,
+        )
+
+    def test_discounted_order_without_customer_matches_old_layout(self):
+        # A kiosk order has no customer; the bolts are sold at a discount
+        order = Order.objects.create(
+            order_id=2024010007, order_amount=Decimal("0"), order_status="Paid"
+        )
+        OrderItem.objects.create(
+            order=order,
+            product=self.bolt,
+            product_price=Decimal("25.00"),
+            discounted_price=Decimal("20.00"),
+            order_item_quantity=4,
+        )
+        OrderItem.objects.create(
+            order=order,
+            product=self.washer,
+            product_price=Decimal("3.50"),
+            order_item_quantity=10,
+        )
+        items = list(order.orderitem_set.select_related("product"))
+
+        breakdown, change = payment_totals(items, Decimal("200.00"), Decimal("12"))
+        order.order_amount = breakdown.total
+        order.order_paid_amount = Decimal("200.00")
+        order.order_change = change
+        print_data = convert_decimals_to_floats(
+            receipt_data(
+                order,
+                items,
+                breakdown.subtotal,
+                breakdown.vat_percentage,
+                "Juan Dela Cruz",
+            )
+        )
+
+        receipt = ReceiptRenderer().render(print_data, datetime(2024, 1, 15, 14, 5))
+
+        self.assertIsNone(order.customer)
+        self.assertEqual(
+            receipt,
+            OLD_HEADER + b"Cashier: Juan Dela Cruz\n"
+            b"POS: KiosCorp POS\n"
+            b"\n"
+            b"Order ID: 2024010007\n"
+            b"Status: Paid\n"
+            b"Date: Mon, Jan 15, 2024\n"
+            b"Time: 02:05 PM\n"
+            b"\n"
+            b"Item Name          Qty    Price\n"
+            b"--------------------------------\n"
+            b"Hex Bolt M8 x 40 Zi 4    25.00\n"
+            b"(Silver,M8)\n"
+            b"\n"
+            b"Flat Washer         10     3.50\n"
+            b"(Black,8mm)\n"
+            b"--------------------------------\n"
+            b"Subtotal:               115.00\n"
+            b"VAT 12.0%:               13.80\n"
+            b"Total:                  128.80\n"
+            b"\n"
+            b"\n"
+            b"Cash: 200.00\n"
+            b"Change: 71.20\n" + OLD_FOOTER,
+        )
+
+
+@override_settings(RECEIPT_PRINTER_BACKEND="null")
+class ShopTestCase(TestCase):
+    """Two products at 12% VAT and an authenticated cashier client."""
+
+    def setUp(self):
+        VATSetting.objects.all().delete()
+        VATSetting.objects.create(vat_percentage=Decimal("12.00"))
+        vat_cache.invalidate()
+
+        sub_category = SubCategory.objects.create(
+            sub_category_name="Bolts",
+            main_category=MainCategory.objects.create(main_category_name="Bolts"),
+        )
+        self.products = [
+            Product.objects.create(
+                product_name=name,
+                product_type="Bolt",
+                product_size="M8",
+                product_brand="Generic",
+                product_color="Silver",
+                product_price=price,
+                product_quantity=100,
+                product_available=100,
+                sub_category=sub_category,
+            )
+            for name, price in (
+                ("Hex Bolt", Decimal("25.00")),
+                ("Nut", Decimal("3.50")),
+            )
+        ]
+
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(username="cashier", password="x")
+        )
+
+    def tearDown(self):
+        vat_cache.invalidate()
+
+    def order(self, bolts=2, nuts=4, days_ago=0):
+        order, _ = create_pending_order(
+            [
+                {
+                    "product": {
+                        "product_id": product.product_id,
+                        "product_price": product.product_price,
+                    },
+                    "quantity": quantity,
+                }
+                for product, quantity in zip(self.products, (bolts, nuts))
+                if quantity
+            ]
+        )
+        if days_ago:
+            Order.objects.filter(order_id=order.order_id).update(
+                order_date_created=timezone.now() - timedelta(days=days_ago)
+            )
+        return order.order_id
+
+    def pay(self, order_id, amount="1000.00"):
+        response = self.client.patch(
+            reverse("pay_order", args=[order_id]),
+            {"order_paid_amount": amount},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+
+class SalesRollupTests(ShopTestCase):
+    """The rollups kept up by book_orders equal a rebuild from the orders."""
+
+    def assertRollupsMatchRebuild(self):
+        def daily():
+            return {
+                (row.daily_sales_date, row.daily_sales_status): (
+                    row.daily_sales_orders,
+                    row.daily_sales_revenue,
+                    row.daily_sales_items,
+                    row.daily_sales_discount,
+                )
+                for row in DailySales.objects.all()
+                # Booking orders out can leave empty rows behind
+                if row.daily_sales_orders
+            }
+
+        def product_months():
+            return {
+                (row.product_id, row.product_monthly_sales_month): (
+                    row.product_monthly_sales_quantity,
+                    row.product_monthly_sales_revenue,
+                )
+                for row in ProductMonthlySales.objects.all()
+                if row.product_monthly_sales_quantity
+                or row.product_monthly_sales_revenue
+            }
+
+        booked = (daily(), product_months())
+        rebuild_daily_sales()
+        rebuild_product_monthly_sales()
+        self.assertEqual(booked, (daily(), product_months()))
+        self.assertTrue(booked[0])
+
+    def test_paying_orders(self):
+        self.pay(self.order())
+        self.pay(self.order(bolts=1, nuts=0, days_ago=40))
+
+        batch = [self.order(bolts=3), self.order(nuts=10, days_ago=1)]
+        response = self.client.post(
+            reverse("pay_orders_batch"),
+            {
+                "orders": [
+                    {"order_id": order_id, "order_paid_amount": "1000.00"}
+                    for order_id in batch
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.data["paid"], 2, response.data)
+
+        self.assertRollupsMatchRebuild()
+
+    def test_voiding_paid_and_pending_orders(self):
+        paid = self.order()
+        self.pay(paid)
+        self.pay(self.order(days_ago=1))
+        pending = self.order(bolts=5)
+
+        for order_id in (paid, pending):
+            response = self.client.patch(reverse("void-order", args=[order_id]))
+            self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertRollupsMatchRebuild()
+        self.assertFalse(
+            DailySales.objects.filter(
+                daily_sales_status="Paid", daily_sales_orders=2
+            ).exists()
+        )
+
+    def test_editing_items_of_a_paid_order(self):
+        order_id = self.order()
+        self.pay(order_id)
+        self.pay(self.order())
+        nuts, bolts = OrderItem.objects.filter(order_id=order_id).order_by(
+            "product_price"
+        )
+
+        response = self.client.patch(
+            reverse("update_order_item", args=[order_id]),
+            {
+                "items": [
+                    {
+                        "order_item_id": bolts.order_item_id,
+                        "quantity": 3,
+                        "discounted_price": "20.00",
+                    },
+                    {"order_item_id": nuts.order_item_id, "quantity": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        # 3 x 20.00 + 1 x 3.50, with the 12% VAT it was paid with
+        self.assertEqual(
+            Order.objects.get(order_id=order_id).order_amount, Decimal("71.12")
+        )
+        self.assertRollupsMatchRebuild()
+
+    def test_editing_a_paid_order_after_the_vat_rate_changed(self):
+        order_id = self.order()
+        self.pay(order_id)
+        VATSetting.objects.update(vat_percentage=Decimal("20.00"))
+        vat_cache.invalidate()
+
+        bolts = OrderItem.objects.get(order_id=order_id, product=self.products[0])
+        response = self.client.patch(
+            reverse("update_order_item", args=[order_id]),
+            {"items": [{"order_item_id": bolts.order_item_id, "quantity": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        # 1 x 25.00 + 4 x 3.50, still with the 12% VAT it was paid with
+        order = Order.objects.get(order_id=order_id)
+        self.assertEqual(order.order_amount, Decimal("43.68"))
+        self.assertEqual(order.order_change, Decimal("956.32"))
+        self.assertRollupsMatchRebuild()
+
+    def test_changing_the_amount_of_a_paid_order(self):
+        order_id = self.order()
+        self.pay(order_id)
+
+        response = self.client.patch(
+            reverse("update_order_amount", args=[order_id]),
+            {"order_amount": "42.50"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertRollupsMatchRebuild()
+        self.assertEqual(
+            DailySales.objects.get(daily_sales_status="Paid").daily_sales_revenue,
+            Decimal("42.50"),
+        )
+
+    def test_expiring_pending_orders(self):
+        self.pay(self.order())
+        self.order(days_ago=1)
+        self.order(bolts=1, days_ago=2)
+
+        self.assertEqual(expire_pending_orders(max_age=timedelta(hours=2)), 2)
+
+        self.assertRollupsMatchRebuild()
+
+
+class StockTests(ShopTestCase):
+    def test_stock_reserved_by_pending_orders_cannot_be_adjusted_away(self):
+        bolt = self.products[0]
+        self.order(bolts=60, nuts=0)
+
+        response = self.client.patch(
+            reverse("product_detail", args=[bolt.product_id]),
+            {"product_quantity": 50},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400, response.data)
+        bolt.refresh_from_db()
+        self.assertEqual((bolt.product_quantity, bolt.product_available), (100, 40))
+
+        response = self.client.patch(
+            reverse("product_detail", args=[bolt.product_id]),
+            {"product_quantity": 70},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        bolt.refresh_from_db()
+        self.assertEqual((bolt.product_quantity, bolt.product_available), (70, 10))
+
+    def test_editing_a_paid_order_sells_or_returns_the_difference(self):
+        bolt = self.products[0]
+        order_id = self.order(bolts=2, nuts=0)
+        self.pay(order_id)
+        bolts = OrderItem.objects.get(order_id=order_id)
+
+        def edit(quantity):
+            return self.client.patch(
+                reverse("update_order_item", args=[order_id]),
+                {
+                    "items": [
+                        {"order_item_id": bolts.order_item_id, "quantity": quantity}
+                    ]
+                },
+                format="json",
+            )
+
+        response = edit(200)
+        self.assertEqual(response.status_code, 400, response.data)
+        response = edit(5)
+        self.assertEqual(response.status_code, 200, response.data)
+        bolt.refresh_from_db()
+        self.assertEqual(
+            (bolt.product_quantity, bolt.product_available, bolt.product_sold),
+            (95, 95, 5),
+        )
+
+        response = edit(1)
+        self.assertEqual(response.status_code, 200, response.data)
+        bolt.refresh_from_db()
+        self.assertEqual(
+            (bolt.product_quantity, bolt.product_available, bolt.product_sold),
+            (99, 99, 1),
+        )
+
+        # The ledger explains the counters
+        ledger = InventoryMovement.objects.filter(product=bolt).aggregate(
+            on_hand=Sum("inventory_movement_on_hand"),
+            available=Sum("inventory_movement_available"),
+        )
+        self.assertEqual((ledger["on_hand"], ledger["available"]), (-1, -1))
+
+
+class PaymentTests(ShopTestCase):
+    def test_payment_that_would_oversell_is_rejected(self):
+        bolt = self.products[0]
+        order_id = self.order(bolts=2, nuts=1)
+        # Stock counted down since the order reserved it
+        Product.objects.filter(product_id=bolt.product_id).update(product_quantity=1)
+
+        response = self.client.patch(
+            reverse("pay_order", args=[order_id]),
+            {"order_paid_amount": "1000.00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn("Insufficient stock for Hex Bolt", response.data["error"])
+
+        # Nothing was sold, not even the nut
+        self.assertEqual(Order.objects.get(order_id=order_id).order_status, "Pending")
+        self.assertEqual(
+            list(
+                Product.objects.order_by("product_id").values_list(
+                    "product_quantity", "product_sold"
+                )
+            ),
+            [(1, 0), (100, 0)],
+        )
+        self.assertFalse(
+            InventoryMovement.objects.filter(inventory_movement_kind="Sale").exists()
+        )
+
+    def test_batch_payment_reports_errors_per_entry(self):
+        paid = self.order()
+        self.pay(paid)
+        good, short = self.order(), self.order(bolts=1, nuts=0)
+
+        response = self.client.post(
+            reverse("pay_orders_batch"),
+            {
+                "orders": [
+                    {"order_id": good, "order_paid_amount": "100.00"},
+                    {"order_id": short, "order_paid_amount": "1.00"},
+                    {"order_id": paid, "order_paid_amount": "100.00"},
+                    {"order_id": good, "order_paid_amount": "100.00"},
+                    {"order_id": 1, "order_paid_amount": "100.00"},
+                    {"order_id": short, "order_paid_amount": "NaN"},
+                    "not a payment",
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data["paid"], response.data["failed"]), (1, 6))
+        self.assertEqual(
+            [outcome.get("error") for outcome in response.data["results"]],
+            [
+                None,
+                "Insufficient amount provided.",
+                "Order is already Paid.",
+                "Order appears more than once in the batch.",
+                "Order not found.",
+                "Invalid payment.",
+                "Invalid payment.",
+            ],
+        )
+        # 2 x 25.00 + 4 x 3.50 with 12% VAT
+        self.assertEqual(response.data["results"][0]["total"], 71.68)
+        self.assertEqual(
+            dict(
+                Order.objects.filter(order_id__in=[good, short]).values_list(
+                    "order_id", "order_status"
+                )
+            ),
+            {good: "Paid", short: "Pending"},
+        )
+
+
+class OrderVersionTests(ShopTestCase):
+    def test_stale_version_is_a_conflict(self):
+        order_id = self.order()
+        version = Order.objects.get(order_id=order_id).order_version
+        self.client.patch(
+            reverse("update_order_amount", args=[order_id]),
+            {"order_amount": "42.50"},
+            format="json",
+        )
+
+        response = self.client.patch(
+            reverse("pay_order", args=[order_id]),
+            {"order_paid_amount": "1000.00", "order_version": version},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 409, response.data)
+        self.assertEqual(Order.objects.get(order_id=order_id).order_status, "Pending")
+
+        response = self.client.patch(
+            reverse("pay_order", args=[order_id]),
+            {"order_paid_amount": "1000.00", "order_version": version + 1},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_version_that_is_not_a_number_is_rejected(self):
+        order_id = self.order()
+        for name, data in (
+            ("pay_order", {"order_paid_amount": "1000.00"}),
+            ("void-order", {}),
+            ("update_order_item", {"items": []}),
+        ):
+            response = self.client.patch(
+                reverse(name, args=[order_id]),
+                {**data, "order_version": "x"},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 400, (name, response.data))
+        self.assertEqual(Order.objects.get(order_id=order_id).order_status, "Pending")
+
+
+class CheckoutTests(ShopTestCase):
+    def cart(self, *quantities):
+        return [
+            {
+                "product": {
+                    "product_id": product.product_id,
+                    "product_price": str(product.product_price),
+                },
+                "quantity": quantity,
+            }
+            for product, quantity in zip(self.products, quantities)
+        ]
+
+    def test_quote_rejects_bodies_that_are_not_a_cart(self):
+        for body in ([1, 2], "cart", {"items": "x"}, {"items": [1]}):
+            response = self.client.post(reverse("quote_cart"), body, format="json")
+            self.assertEqual(response.status_code, 400, (body, response.data))
+
+        bolt = self.products[0]
+        response = self.client.post(
+            reverse("quote_cart"),
+            {"items": [{"product_id": bolt.product_id, "quantity": 2}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_cart_that_oversells_is_rejected_without_reserving(self):
+        bolt = self.products[0]
+        self.order(bolts=60, nuts=0)
+
+        # 41 bolts in two lines, with 40 left to sell
+        cart = self.cart(21, 1) + self.cart(20)
+        response = self.client.post(
+            reverse("create_order"), {"items": cart}, format="json"
+        )
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertIn("Insufficient stock for Hex Bolt", response.data["message"])
+
+        bolt.refresh_from_db()
+        self.assertEqual(bolt.product_available, 40)
+        self.assertEqual(Order.objects.count(), 1)
+        nut = Product.objects.get(product_id=self.products[1].product_id)
+        self.assertEqual(nut.product_available, 100)
+
+    def test_quantity_that_is_not_a_whole_number_is_rejected(self):
+        for quantity in (1.7, "1.5", "x", True):
+            response = self.client.post(
+                reverse("create_order"),
+                {"items": self.cart(quantity)},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 400, (quantity, response.data))
+        self.assertFalse(Order.objects.exists())
+
+    def test_kiosk_slip_total_includes_vat_like_the_quote(self):
+        bolt, nut = self.products
+        cart = [
+            {"product_id": bolt.product_id, "quantity": 2},
+            {"product_id": nut.product_id, "quantity": 4},
+        ]
+        quote = self.client.post(reverse("quote_cart"), {"items": cart}, format="json")
+
+        response = self.client.post(
+            reverse("print_receipt"),
+            {
+                "items": [
+                    {
+                        "product": {
+                            "product_id": product.product_id,
+                            "product_name": product.product_name,
+                            "product_price": str(product.product_price),
+                        },
+                        "quantity": line["quantity"],
+                    }
+                    for product, line in zip(self.products, cart)
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+        # 2 x 25.00 + 4 x 3.50 = 64.00, plus 12% VAT
+        printed = PrintJob.objects.get(
+            order_id=response.data["order_id"]
+        ).print_job_payload
+        self.assertEqual(printed["total"], 71.68)
+        self.assertEqual(Decimal(str(printed["total"])), quote.data["total"])
+
+
+@override_settings(ID_ALLOCATOR_BLOCK_SIZES={"test": 10})
+class IdAllocatorTests(TestCase):
+    def setUp(self):
+        self.ids = IdAllocator("test", "NextOrderItemId", width=4)
+
+    def counter(self):
+        return NextOrderItemId.objects.order_by("id").first().next_id
+
+    def test_leases_a_block_and_hands_out_the_rest_from_memory(self):
+        self.ids.next_id()
+        start = self.counter()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.ids.allocate(3)
+        self.assertEqual(self.counter(), start + 10)
+
+        second = self.ids.allocate(7)
+        self.assertEqual(self.counter(), start + 10)
+        numbers = [id % 10**4 for id in first + second]
+        self.assertEqual(numbers, list(range(start, start + 10)))
+
+    def test_block_of_a_rolled_back_lease_is_not_reused(self):
+        self.ids.next_id()
+        start = self.counter()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.ids.allocate(2)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        # The counter rolled back with the lease and nothing was pooled
+        self.assertEqual(self.counter(), start)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            numbers = [id % 10**4 for id in self.ids.allocate(12)]
+        self.assertEqual(numbers, list(range(start, start + 12)))
+        self.assertEqual(self.counter(), start + 12)
+
+
+class OrderIdTests(TestCase):
+    def at(self, *utc):
+        # timezone.now() as a UTC wall-clock time
+        return patch(
+            "django.utils.timezone.now",
+            return_value=datetime(*utc, tzinfo=dt_timezone.utc),
+        )
+
+    def test_ids_restart_every_shop_month_within_its_range(self):
+        ids = PeriodIdAllocator("test_order", width=6)
+        with self.at(2024, 5, 20, 8):
+            may = [ids.next_id(), ids.next_id()]
+        # 16:30 UTC on 31 May is already 1 June in Manila
+        with self.at(2024, 5, 31, 16, 30):
+            june = [ids.next_id()]
+
+        self.assertEqual(may, [202405000001, 202405000002])
+        self.assertEqual(june, [202406000001])
+        low, high = ids.id_range(2024, 5)
+        self.assertTrue(all(low <= id <= high for id in may))
+        self.assertEqual(ids.id_range(2024), (202401000000, 202412999999))
+
+    def test_migration_renumbers_orders_per_shop_month(self):
+        for legacy_id, created in (
+            (5, datetime(2024, 5, 10, 3, tzinfo=dt_timezone.utc)),
+            (9, datetime(2024, 5, 31, 20, tzinfo=dt_timezone.utc)),
+            (12, datetime(2024, 5, 20, 3, tzinfo=dt_timezone.utc)),
+        ):
+            Order.objects.create(
+                order_id=legacy_id, order_amount=0, order_date_created=created
+            )
+        IdCounter.objects.filter(entity="order").delete()
+
+        import_module("accounts.migrations.0022_order_id_per_month").renumber_orders(
+            apps, None
+        )
+
+        self.assertEqual(
+            dict(Order.objects.values_list("order_legacy_id", "order_id")),
+            {5: 202405000001, 12: 202405000002, 9: 202406000001},
+        )
+        self.assertEqual(
+            dict(
+                IdCounter.objects.filter(entity="order").values_list(
+                    "period", "next_value"
+                )
+            ),
+            {202405: 3, 202406: 2},
+        )
+
+
+class ExportTests(ShopTestCase):
+    def export(self, **params):
+        return self.client.get(reverse("export_sales", args=["orders", "csv"]), params)
+
+    def test_date_range_follows_the_shop_day(self):
+        orders = {}
+        for label, created in (
+            # 23:30 on 31 May and 00:30 on 1 June in Manila
+            ("may", datetime(2024, 5, 31, 15, 30, tzinfo=dt_timezone.utc)),
+            ("june", datetime(2024, 5, 31, 16, 30, tzinfo=dt_timezone.utc)),
+            ("july", datetime(2024, 6, 30, 16, 30, tzinfo=dt_timezone.utc)),
+        ):
+            orders[label] = self.order()
+            Order.objects.filter(order_id=orders[label]).update(
+                order_date_created=created
+            )
+
+        response = self.export(start="2024-06-01", end="2024-06-30")
+        self.assertEqual(response.status_code, 200)
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([int(row.split(",")[0]) for row in rows[1:]], [orders["june"]])
+
+    def test_invalid_dates_are_rejected(self):
+        for params in (
+            {"start": "2024-02-30"},
+            {"end": "June"},
+            {"start": "2024-06-02", "end": "2024-06-01"},
+        ):
+            self.assertEqual(self.export(**params).status_code, 400, params)
+
+        with self.assertRaises(CommandError):
+            call_command("export_sales", start="2024-02-30")
+
+    def test_failed_export_leaves_no_file_behind(self):
+        def fail_midway(error):
+            def write_export(name, file_format, out, start=None, end=None):
+                out.write(b"order_id\n")
+                raise error
+
+            return patch(
+                "accounts.management.commands.export_sales.write_export",
+                write_export,
+            )
+
+        with tempfile.TemporaryDirectory() as output:
+            with fail_midway(ExportError("Disk full.")):
+                with self.assertRaises(CommandError):
+                    call_command("export_sales", dataset=["orders"], output=output)
+            with fail_midway(RuntimeError("Interrupted.")):
+                with self.assertRaises(RuntimeError):
+                    call_command("export_sales", dataset=["orders"], output=output)
+            self.assertEqual(os.listdir(output), [])
+
+            call_command(
+                "export_sales", dataset=["orders"], output=output, stdout=io.StringIO()
+            )
+            self.assertEqual(os.listdir(output), ["orders.csv"])
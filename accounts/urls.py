@@ -29,7 +29,9 @@ from .views import (
     low_selling_products,
     # Orders
     create_order,
+    quote_cart_view,
     pay_order,
+    pay_orders_batch,
     order_counts,
     PendingOrdersView,
     VoidOrderView,
@@ -43,9 +45,13 @@ from .views import (
     sales_by_category,
     satisfaction_overview,
     top_selling_products,
+    product_rankings,
     get_monthly_products_sold,
     daily_sales,
     get_sales_data_whole_year,
+    stream_sales_data_whole_year,
+    paid_orders_whole_year,
+    export_sales,
     update_order_item,
     update_order_amount,
     cashier_transactions,
@@ -54,6 +60,8 @@ from .views import (
     # Miscellaneous
     validate_session,
     print_receipt,
+    print_receipt_status,
+    printer_status,
     ping,
     VATSettingView,
 )
@@ -109,7 +117,9 @@ urlpatterns = [
     path("api/orders/pending/", PendingOrdersView.as_view(), name="pending-orders"),
     path("api/orders/void/<int:order_id>/", VoidOrderView.as_view(), name="void-order"),
     path("api/create-order/", create_order, name="create_order"),
+    path("api/cart/quote/", quote_cart_view, name="quote_cart"),
     path("api/orders/pay/<int:order_id>/", pay_order, name="pay_order"),
+    path("api/orders/pay/batch/", pay_orders_batch, name="pay_orders_batch"),
     path("api/orders/counts/", order_counts, name="order_counts"),
     path("api/orders/history/", order_history, name="order_history"),
     # Sales
@@ -119,6 +129,7 @@ urlpatterns = [
     path(
         "api/top-selling-products/", top_selling_products, name="top_selling_products"
     ),
+    path("api/products/rankings/", product_rankings, name="product_rankings"),
     path(
         "api/customers/counts/<str:view_type>/",
         CustomerCountByMonthView.as_view(),
@@ -133,6 +144,21 @@ urlpatterns = [
     path(
         "api/sales/data/whole/", get_sales_data_whole_year, name="sales_data_whole_year"
     ),
+    path(
+        "api/sales/data/whole/stream/",
+        stream_sales_data_whole_year,
+        name="sales_data_whole_year_stream",
+    ),
+    path(
+        "api/sales/data/whole/paid-orders/",
+        paid_orders_whole_year,
+        name="sales_data_whole_year_paid_orders",
+    ),
+    path(
+        "api/exports/<str:dataset_name>/<str:file_format>/",
+        export_sales,
+        name="export_sales",
+    ),
     path(
         "api/orders/update-order/<int:order_id>/",
         update_order_item,
@@ -153,9 +179,15 @@ urlpatterns = [
     ),
     # Miscellaneous
     path("api/print-receipt/", print_receipt, name="print_receipt"),
+    path(
+        "api/print-receipt/status/<int:order_id>/",
+        print_receipt_status,
+        name="print_receipt_status",
+    ),
     path("api/sales/clear/", clear_sales_data, name="clear_sales_data"),
     path("api/customers/clear/", clear_customer_data, name="clear_customer_data"),
     path("api/ping/", ping, name="ping"),
+    path("api/printer/status/", printer_status, name="printer_status"),
     path("api/vat-setting/", VATSettingView.as_view(), name="vat-setting"),
 ]
 
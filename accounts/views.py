@@ -1,17 +1,21 @@
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import timedelta, datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import json
-import socket
-import subprocess
-import os
-import win32print
+import tempfile
 
+from django.conf import settings
 from django.contrib.auth import authenticate, logout as django_logout
 from django.core.files.storage import default_storage
-from django.http import HttpResponse, JsonResponse
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.db import transaction
-from django.db.models import Count, Sum, F, Prefetch
-from django.db.models.functions import TruncMonth, ExtractMonth, ExtractDay, TruncDate
+from django.db.models import Count, Sum, F, Q
+from django.db.models.functions import TruncMonth, ExtractMonth, ExtractDay
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
@@ -22,6 +26,7 @@ from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
+from rest_framework.utils.encoders import JSONEncoder
 
 from .models import (
     CustomUser,
@@ -32,8 +37,11 @@ from .models import (
     Order,
     OrderItem,
     Customer,
+    DailySales,
     Feedback,
     VATSetting,
+    PrintJob,
+    ProductMonthlySales,
 )
 from .serializers import (
     UserSerializer,
@@ -49,10 +57,28 @@ from .serializers import (
     VATSettingSerializer,
 )
 from .permissions import IsOwnerOrAdmin
-
-
-RPI_IP = "192.168.254.183"
-RPI_PORT = 8001  # Use port 8001 to connect to the print server
+from .id_allocator import order_ids
+from .checkout import CheckoutError, create_pending_order, quote_cart, whole_number
+from .exports import ExportError, FORMATS, dataset, file_name, iter_csv, write_export
+from .concurrency import ConflictError, retry_on_conflict, save_versioned
+from .inventory import (
+    InsufficientStockError,
+    release_orders,
+    release_stock,
+    reserve_stock,
+    return_sold,
+    sell_more,
+    sell_stock,
+)
+from .payments import payment_totals, receipt_data, settle_orders
+from .pricing import stored_order_subtotal, to_cents, totals, vat_cache
+from .rankings import RankingError, rank_products
+from .sales_rollup import book_orders
+from .order_ingest import order_committer
+from .print_outbox import enqueue_print_job, print_dispatcher
+from .receipt_printer import receipt_printer
+from .printer_monitor import printer_monitor
+from .clock import shop_clock
 
 
 @api_view(["POST"])
@@ -62,49 +88,20 @@ def print_receipt(request):
 
         # Start a transaction
         with transaction.atomic():
-            # Create a new Customer instance (you may want to customize this)
-            customer = Customer.objects.create()
-
-            # Get the current count of pending orders (This will give us the queue number)
-            pending_count = Order.objects.filter(order_status="Pending").count()
-
-            # If no pending orders, set queue number to 1
-            queue_number = 1 if pending_count == 0 else pending_count + 1
+            order, products = create_pending_order(print_data["items"])
 
-            # Create a new Order instance
-            order = Order.objects.create(
-                customer=customer,
-                order_amount=print_data["total"],
-                order_status="Pending",
-            )
+            # Assigned from the daily sequence when the order was inserted
+            queue_number = order.order_queue_number
 
-            # Create a new OrderItem instance for each product in the cart
+            # Ensure to pass color and size along with the item details
             for item in print_data["items"]:
-                try:
-                    product = Product.objects.get(
-                        product_id=item["product"]["product_id"]
-                    )
-                    # Create OrderItem instance
-                    order_item = OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        product_price=item["product"]["product_price"],
-                        order_item_quantity=item["quantity"],
-                    )
-                    # Ensure to pass color and size along with the item details
-                    item["product"]["product_color"] = product.product_color
-                    item["product"]["product_size"] = product.product_size
-
-                except Product.DoesNotExist:
-                    return Response(
-                        {
-                            "success": False,
-                            "message": f"Error: Product with ID {item['product']['product_id']} does not exist.",
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+                product = products[int(item["product"]["product_id"])]
+                item["product"]["product_color"] = product.product_color
+                item["product"]["product_size"] = product.product_size
 
             # Prepare the print data
+            # Computed server-side, with VAT on top as in the cart quote
+            print_data["total"] = float(totals(order.order_amount).total)
             print_data["order_id"] = order.order_id  # Add order_id to print_data
             print_data["order_status"] = (
                 order.order_status
@@ -126,37 +123,23 @@ def print_receipt(request):
                 for item in print_data["items"]
             ]
 
-            # Attempt to connect to the printer with a timeout
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(10)  # Set a timeout of 10 seconds
-                    s.connect((RPI_IP, RPI_PORT))
-                    s.sendall(json.dumps(print_data).encode("utf-8"))
-                    response = s.recv(1024).decode("utf-8")
-
-                if "completed successfully" in response:
-                    # Return the order_id along with success message
-                    return Response(
-                        {
-                            "success": True,
-                            "message": "Print job sent successfully",
-                            "order_id": order.order_id,  # Include the order_id in the response
-                        }
-                    )
-                else:
-                    # If printing fails, raise an exception to trigger rollback
-                    raise Exception("Printing failed: " + response)
+            # Printed by the dispatcher once the order has committed
+            print_job = enqueue_print_job(order, print_data)
 
-            except socket.timeout:
-                # If the printer is not detected within 15 seconds, proceed to save the order
-                return Response(
-                    {
-                        "success": True,
-                        "message": "Printer not detected within 15 seconds. Order saved without printing.",
-                        "order_id": order.order_id,  # Include the order_id in the response
-                    }
-                )
+        return Response(
+            {
+                "success": True,
+                "message": "Order saved. Receipt queued for printing.",
+                "order_id": order.order_id,  # Include the order_id in the response
+                "print_job_id": print_job.print_job_id,
+            }
+        )
 
+    except CheckoutError as e:
+        return Response(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     except Exception as e:
         print(f"Error in print_receipt: {str(e)}")
         return Response(
@@ -165,57 +148,65 @@ def print_receipt(request):
         )
 
 
+@api_view(["GET"])
+def print_receipt_status(request, order_id):
+    # Polled by the kiosk until its receipt has printed
+    print_job = (
+        PrintJob.objects.filter(order_id=order_id).order_by("-print_job_id").first()
+    )
+    if print_job is None:
+        return Response(
+            {"error": "No receipt found for this order."},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    if print_job.print_job_status == "Pending":
+        print_dispatcher.notify()
+
+    return Response(
+        {
+            "order_id": order_id,
+            "print_job_id": print_job.print_job_id,
+            "status": print_job.print_job_status,
+            "attempts": print_job.print_job_attempts,
+            "last_error": print_job.print_job_last_error,
+            "printed_at": print_job.print_job_printed,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
 @api_view(["POST"])
 def create_order(request):
     try:
         order_data = request.data
 
-        # Create a new Customer instance (you may want to customize this)
-        customer = Customer.objects.create()
-
-        # Create a new Order instance
-        order = Order.objects.create(
-            customer=customer,
-            order_amount=order_data["total"],
-            order_status="Pending",
-        )
-
-        # Create a new OrderItem instance for each product in the cart
-        for item in order_data["items"]:
+        if settings.ORDER_GROUP_COMMIT:
+            # The committer thread writes the order and its log entry
+            future = order_committer.submit(order_data["items"], request.user.username)
             try:
-                product = Product.objects.get(product_id=item["product"]["product_id"])
-
-                # Check if there is enough stock for the requested quantity
-                if product.product_quantity < item["quantity"]:
+                order = future.result(timeout=settings.ORDER_GROUP_COMMIT_TIMEOUT)
+            except FutureTimeoutError:
+                # Only give up if the order is still queued; once its batch
+                # has started it may commit, so wait for the real order ID
+                # rather than have the kiosk retry and create a duplicate
+                if future.cancel():
                     return Response(
                         {
                             "success": False,
-                            "message": f"Error: Insufficient stock for {product.product_name}. Available: {product.product_quantity}, Required: {item['quantity']}.",
+                            "message": "The server is busy; the order was not "
+                            "created. Please try again.",
                         },
-                        status=status.HTTP_400_BAD_REQUEST,
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
                     )
+                order = future.result()
+        else:
+            order, _ = create_pending_order(order_data["items"])
 
-                # Create the OrderItem instance if stock is sufficient
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    product_price=item["product"]["product_price"],
-                    order_item_quantity=item["quantity"],
-                )
-
-            except Product.DoesNotExist:
-                return Response(
-                    {
-                        "success": False,
-                        "message": f"Error: Product with ID {item['product']['product_id']} does not exist.",
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        Log.objects.create(
-            username=request.user.username,
-            action=f"Created a new order with ID {order.order_id}",
-        )
+            Log.objects.create(
+                username=request.user.username,
+                action=f"Created a new order with ID {order.order_id}",
+            )
         return Response(
             {
                 "success": True,
@@ -224,6 +215,34 @@ def create_order(request):
             },
             status=status.HTTP_201_CREATED,
         )
+    except CheckoutError as e:
+        return Response(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    except Exception as e:
+        return Response(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["POST"])
+def quote_cart_view(request):
+    # Lets the kiosk revalidate a cart (prices, stock, VAT) without ordering
+    if not isinstance(request.data, dict):
+        return Response(
+            {"success": False, "message": "Expected an object with items."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        quote = quote_cart(request.data.get("items", []))
+        return Response(quote, status=status.HTTP_200_OK)
+    except CheckoutError as e:
+        return Response(
+            {"success": False, "message": str(e)},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     except Exception as e:
         return Response(
             {"success": False, "message": str(e)},
@@ -756,35 +775,39 @@ class ProductDetailView(APIView):
 
     def put(self, request, product_id):
         try:
-            product = Product.objects.get(product_id=product_id)
-            serializer = ProductSerializer(product, data=request.data)
-            if serializer.is_valid():
-                serializer.save()
-                Log.objects.create(
-                    username=request.user.username,
-                    action=f"Updated product {product.product_name}",
-                )
-                return Response(serializer.data)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return self._update(request, product_id, "Updated product")
         except Product.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
+        except ConflictError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
     def patch(self, request, product_id):
         try:
+            # `partial=True` allows partial updates
+            return self._update(
+                request, product_id, "Partially updated product", partial=True
+            )
+        except Product.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        except ConflictError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+    def _update(self, request, product_id, action, partial=False):
+        def update():
             product = Product.objects.get(product_id=product_id)
-            serializer = ProductSerializer(
-                product, data=request.data, partial=True
-            )  # `partial=True` allows partial updates
+            serializer = ProductSerializer(product, data=request.data, partial=partial)
             if serializer.is_valid():
                 serializer.save()
                 Log.objects.create(
                     username=request.user.username,
-                    action=f"Partially updated product {product.product_name}",
+                    action=f"{action} {product.product_name}",
                 )
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        except Product.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        # A version sent by the client will not match on a retry either
+        attempts = 1 if request.data.get("product_version") else None
+        return retry_on_conflict(update, attempts=attempts)
 
     def delete(self, request, product_id):
         try:
@@ -835,11 +858,28 @@ def reset_password(request):
 
 class PendingOrdersView(APIView):
     def get(self, request):
-        pending_orders = Order.objects.filter(order_status="Pending")
+        pending_orders = Order.objects.filter(order_status="Pending").prefetch_related(
+            "orderitem_set"
+        )
         serializer = OrderSerializer(pending_orders, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def _invalid_order_version(request):
+    """A 400 response if the client sent an order_version that is not a number."""
+    version = request.data.get("order_version")
+    if version in (None, ""):
+        return None
+    try:
+        whole_number(version)
+    except (TypeError, ValueError, InvalidOperation):
+        return Response(
+            {"error": f"Invalid order version {version!r}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return None
+
+
 class VoidOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -852,15 +892,14 @@ class VoidOrderView(APIView):
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
 
-            # Fetch the order by ID
-            order = Order.objects.get(order_id=order_id)
-            order.order_status = "Void"  # Update the order status to "Void"
-            order.order_cashier = f"{request.user.first_name} {request.user.last_name}"
-            order.save()  # Save the changes
+            invalid_version = _invalid_order_version(request)
+            if invalid_version:
+                return invalid_version
 
-            # Log the void action
-            Log.objects.create(
-                username=request.user.username, action=f"Voided order {order_id}"
+            # Retried from the start if the order changes while voiding it
+            retry_on_conflict(
+                lambda: self._void(request, order_id),
+                attempts=1 if request.data.get("order_version") else None,
             )
 
             return Response(
@@ -871,158 +910,192 @@ class VoidOrderView(APIView):
             return Response(
                 {"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND
             )
+        except ConflictError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
+    def _void(self, request, order_id):
+        with transaction.atomic():
+            # Fetch the order by ID
+            order = Order.objects.get(order_id=order_id)
 
-def is_printer_ready(printer_name):
-    try:
-        hprinter = win32print.OpenPrinter(printer_name)
-        printer_info = win32print.GetPrinter(hprinter, 2)
-        win32print.ClosePrinter(hprinter)
-
-        # Check if the printer is ready
-        status = printer_info["Status"]
-        print(f"Printer status code: {status}")
-
-        # Check for printer statuses
-        if status == 0:  # 0 indicates the printer is ready
-            return True
-        elif (
-            status & win32print.PRINTER_STATUS_OFFLINE
-        ):  # Check if the printer is offline
-            print("Printer is offline.")
-            return False
-        elif status in (
-            1,
-            2,
-            3,
-            4,
-            5,
-        ):  # 1: paused, 2: error, 3: pending deletion, 4: paper jam, 5: other errors
-            print("Printer is not ready or has an issue.")
-            return False
-        else:
-            print("Printer is in an unknown state.")
-            return False
-    except Exception as e:
-        print(f"Error checking printer status: {str(e)}")
-        return False
+            # A pending order still holds its stock reservation
+            if order.order_status == "Pending":
+                release_orders([order.order_id])
+            # A paid order moves from the day's paid sales to its voids
+            book_orders([order], -1)
+
+            order.order_status = "Void"  # Update the order status to "Void"
+            order.order_cashier = f"{request.user.first_name} {request.user.last_name}"
+            # Fails if the order was changed (e.g. paid) since it was read
+            save_versioned(
+                order,
+                ["order_status", "order_cashier"],
+                "order_version",
+                request.data.get("order_version"),
+            )
+            book_orders([order])
+
+            # Log the void action
+            Log.objects.create(
+                username=request.user.username, action=f"Voided order {order_id}"
+            )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def printer_status(request):
+    # Last state published by the printer monitor, for the cashier UI
+    return Response(printer_monitor.state(), status=status.HTTP_200_OK)
 
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
 def pay_order(request, order_id):
     try:
-        # Check if the printer is ready before processing the payment
-        printer_name = "POS58 v9"  # Replace with your actual printer name
-        if not is_printer_ready(printer_name):
+        # Check the last known printer state before processing the payment
+        if not printer_monitor.is_ready():
             return Response(
                 {"error": "Printer is not ready. Please check the printer connection."},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
 
-        with transaction.atomic():
-            order = Order.objects.get(order_id=order_id)
+        invalid_version = _invalid_order_version(request)
+        if invalid_version:
+            return invalid_version
 
-            # Check stock availability before processing the payment
-            for item in order.orderitem_set.all():
-                product = item.product
-                if product.product_quantity < item.order_item_quantity:
-                    return Response(
-                        {
-                            "error": f"Insufficient stock for {product.product_name}. Available: {product.product_quantity}, Required: {item.order_item_quantity}.",
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+        # Retried from the start if the order changes while it is being paid
+        return retry_on_conflict(
+            lambda: _pay_order(request, order_id),
+            attempts=1 if request.data.get("order_version") else None,
+        )
+
+    except Order.DoesNotExist:
+        return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+    except InsufficientStockError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            amount_given = request.data.get("order_paid_amount")
-            amount_given = Decimal(amount_given)
 
-            # Calculate subtotal using discounted prices
-            subtotal = sum(
-                (item.discounted_price or item.product_price) * item.order_item_quantity
-                for item in order.orderitem_set.all()
+def _pay_order(request, order_id):
+    with transaction.atomic():
+        order = Order.objects.get(order_id=order_id)
+        if order.order_status != "Pending":
+            return Response(
+                {"error": f"Order is already {order.order_status}."},
+                status=status.HTTP_409_CONFLICT,
             )
+        items = list(order.orderitem_set.select_related("product"))
 
-            # Get the VAT percentage from the request data
-            vat_percentage = request.data.get(
-                "vat_percentage", 0
-            )  # Default to 0 if not provided
-            vat_percentage = float(
-                vat_percentage
-            )  # Ensure it's a float for calculations
+        amount_given = request.data.get("order_paid_amount")
+        amount_given = Decimal(amount_given)
 
-            # Convert vat_percentage to Decimal
-            vat_percentage = Decimal(vat_percentage)
+        # Discounted prices and the shop's VAT setting, never client values
+        breakdown, change = payment_totals(items, amount_given)
 
-            vat_amount = subtotal * (vat_percentage / 100)  # Calculate VAT amount
-            total_amount = subtotal + vat_amount  # Total including VAT
-            change = amount_given - total_amount
+        if change < 0:
+            return Response(
+                {"error": "Insufficient amount provided."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-            if change < 0:
-                return Response(
-                    {"error": "Insufficient amount provided."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        # Update the order details, unless someone else changed the order
+        # since it was read (e.g. voided it from another terminal)
+        order.order_status = "Paid"
+        order.order_paid_amount = amount_given
+        order.order_change = change
+        order.order_amount = breakdown.total  # Update to total amount after VAT
+        order.order_vat_percentage = breakdown.vat_percentage
+        order.order_cashier = f"{request.user.first_name} {request.user.last_name}"
+        save_versioned(
+            order,
+            [
+                "order_status",
+                "order_paid_amount",
+                "order_change",
+                "order_amount",
+                "order_vat_percentage",
+                "order_cashier",
+            ],
+            "order_version",
+            request.data.get("order_version"),
+        )
 
-            # Update the order details
-            order.order_status = "Paid"
-            order.order_paid_amount = amount_given
-            order.order_change = change
-            order.order_amount = total_amount  # Update to total amount after VAT
-            order.order_cashier = f"{request.user.first_name} {request.user.last_name}"
-            order.save()
-
-            # Update product quantities and sold counts
-            for item in order.orderitem_set.all():
-                product = item.product
-                product.product_quantity -= item.order_item_quantity
-                product.product_sold += item.order_item_quantity
-                product.save()
-
-            # Get the cashier's name from the request data
-            cashier_first_name = request.data.get("cashier_first_name", "Puerto")
-            cashier_last_name = request.data.get("cashier_last_name", "")
-            cashier_name = f"{cashier_first_name} {cashier_last_name}".strip()
-
-            # Prepare data for printing
-            print_data = {
-                "items": [
-                    {
-                        "product": {
-                            "product_id": item.product.product_id,
-                            "product_name": item.product.product_name,
-                            "product_price": float(item.product.product_price),
-                        },
-                        "quantity": item.order_item_quantity,
-                        "color": item.product.product_color,
-                        "size": item.product.product_size,
-                    }
-                    for item in order.orderitem_set.all()
-                ],
-                "subtotal": float(subtotal),  # Include subtotal
-                "total": float(total_amount),  # Total after VAT
-                "order_id": order.order_id,
-                "order_status": order.order_status,
-                "paid_amount": float(amount_given),
-                "change": float(change),
-                "cashier": cashier_name,
-                "vat_percentage": vat_percentage,  # Include VAT percentage
-                "fallback_time": datetime.now().isoformat(),
-            }
+        # Check and take the stock in one conditional update; raises
+        # InsufficientStockError (rolling everything back) if any is short
+        sell_stock(items)
+        book_orders([order])
 
-            # Send print data to the print receipt function
-            print_receiptPOS(print_data)
+        # Get the cashier's name from the request data
+        cashier_first_name = request.data.get("cashier_first_name", "Puerto")
+        cashier_last_name = request.data.get("cashier_last_name", "")
+        cashier_name = f"{cashier_first_name} {cashier_last_name}".strip()
 
-            Log.objects.create(
-                username=request.user.username, action=f"Paid for order {order_id}"
+        # Prepare data for printing
+        print_data = receipt_data(
+            order, items, breakdown.subtotal, breakdown.vat_percentage, cashier_name
+        )
+
+        # Send print data to the print receipt function
+        print_receiptPOS(print_data)
+
+        Log.objects.create(
+            username=request.user.username, action=f"Paid for order {order_id}"
+        )
+        return Response(
+            {"success": "Order successfully paid.", "order_id": order.order_id},
+            status=status.HTTP_200_OK,
+        )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def pay_orders_batch(request):
+    """Pay many pending orders at once, e.g. when settling up at closing time.
+
+    Expects `{"orders": [{"order_id", "order_paid_amount"}]}` and answers
+    with one outcome per order.
+    """
+    try:
+        payments = request.data.get("orders")
+        if not isinstance(payments, list) or not payments:
+            return Response(
+                {"error": "No orders to pay."}, status=status.HTTP_400_BAD_REQUEST
             )
+
+        # Check the last known printer state before processing the payments
+        if not printer_monitor.is_ready():
             return Response(
-                {"success": "Order successfully paid.", "order_id": order.order_id},
-                status=status.HTTP_200_OK,
+                {"error": "Printer is not ready. Please check the printer connection."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
 
-    except Order.DoesNotExist:
-        return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        # Get the cashier's name from the request data
+        cashier_first_name = request.data.get("cashier_first_name", "Puerto")
+        cashier_last_name = request.data.get("cashier_last_name", "")
+        cashier_name = f"{cashier_first_name} {cashier_last_name}".strip()
+
+        # Retried from the start if an order changes while the batch runs
+        outcomes = retry_on_conflict(
+            lambda: settle_orders(
+                payments,
+                cashier=f"{request.user.first_name} {request.user.last_name}",
+                cashier_name=cashier_name,
+                username=request.user.username,
+            )
+        )
+        paid = sum(1 for outcome in outcomes if outcome["success"])
+        return Response(
+            {"paid": paid, "failed": len(outcomes) - paid, "results": outcomes},
+            status=status.HTTP_200_OK,
+        )
+
+    except (InsufficientStockError, ConflictError) as e:
+        # Stock or an order changed while the batch was being checked;
+        # nothing was paid
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1042,26 +1115,17 @@ def print_receiptPOS(print_data):
         # Convert Decimal values to float
         print_data = convert_decimals_to_floats(print_data)
 
-        # Convert print_data to JSON string for passing to the print script
-        print_data_json = json.dumps(print_data)
-
-        # Define the relative path to the print_receiptPOS.py script
-        script_path = os.path.join(os.path.dirname(__file__), "print_receiptPOS.py")
-
-        # Call the print script with the print data as an argument
-        process = subprocess.Popen(
-            ["python", script_path, print_data_json],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        # Wait for the process to complete and get the output
-        stdout, stderr = process.communicate()
-
-        if process.returncode == 0:
-            return True  # Printing was successful
-        else:
-            raise Exception(f"Printing failed: {stderr.decode('utf-8')}")
+        # Printed by the long-lived printer worker; wait for the outcome
+        future = receipt_printer.submit(print_data)
+        try:
+            future.result(timeout=settings.RECEIPT_PRINT_TIMEOUT)
+        except FutureTimeoutError:
+            # Only give up (and roll the payment back) if the receipt has not
+            # started; once it prints and opens the drawer, the sale stands
+            if future.cancel():
+                raise Exception("Timed out waiting for the receipt printer.")
+            future.result()
+        return True  # Printing was successful
 
     except Exception as e:
         raise Exception(f" Error in print_receiptPOS: {str(e)}")
@@ -1122,13 +1186,14 @@ class CustomerCountByMonthView(APIView):
         if view_type == "month":
             # Get the selected year from query params, default to current year
             selected_year = int(request.query_params.get("year", current_year))
+            # Read from the daily sales rollup, not the orders themselves
             order_counts = (
-                Order.objects.filter(
-                    order_status="Paid", order_date_created__year=selected_year
+                DailySales.objects.filter(
+                    daily_sales_status="Paid", daily_sales_date__year=selected_year
                 )
-                .annotate(month=ExtractMonth("order_date_created"))
+                .annotate(month=ExtractMonth("daily_sales_date"))
                 .values("month")
-                .annotate(count=Count("order_id"))
+                .annotate(count=Sum("daily_sales_orders"))
                 .order_by("month")
             )
             # Initialize data with 0s for each month
@@ -1150,14 +1215,14 @@ class CustomerCountByMonthView(APIView):
                     "-"
                 )  # Extract year and month from start_date
                 order_counts = (
-                    Order.objects.filter(
-                        order_status="Paid",
-                        order_date_created__year=year,
-                        order_date_created__month=month,
+                    DailySales.objects.filter(
+                        daily_sales_status="Paid",
+                        daily_sales_date__year=year,
+                        daily_sales_date__month=month,
                     )
-                    .annotate(day=ExtractDay("order_date_created"))
+                    .annotate(day=ExtractDay("daily_sales_date"))
                     .values("day")
-                    .annotate(count=Count("order_id"))
+                    .annotate(count=Sum("daily_sales_orders"))
                     .order_by("day")
                 )
                 # Initialize data with 0s for up to 31 days
@@ -1177,47 +1242,76 @@ class CustomerCountByMonthView(APIView):
             return Response(data)
 
 
+def _ranked_product(request, row):
+    # Product details of a rank_products row, as the dashboard shows them
+    return {
+        "product_id": row["product_id"],
+        "product_name": row["product__product_name"],
+        "product_image": request.build_absolute_uri(
+            default_storage.url(row["product__product_image"])
+        ),
+        "product_type": row["product__product_type"],  # Include product type
+        "product_color": row["product__product_color"],
+        "product_size": row["product__product_size"],  # Include product size
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def product_rankings(request):
+    """Top or bottom N products per day, week, month or quarter of a year.
+
+    Query parameters: `year` (default: this year), `period` (day, week,
+    month or quarter), `metric` (quantity or revenue), `direction` (top or
+    bottom), `threshold` (optional) and `limit` (default 7).
+    """
+    try:
+        threshold = request.query_params.get("threshold")
+        rows = rank_products(
+            int(request.query_params.get("year", shop_clock.now().year)),
+            period=request.query_params.get("period", "month"),
+            metric=request.query_params.get("metric", "quantity"),
+            direction=request.query_params.get("direction", "top"),
+            threshold=Decimal(threshold) if threshold is not None else None,
+            limit=int(request.query_params.get("limit", 7)),
+        )
+    except RankingError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except (ValueError, InvalidOperation):
+        return Response(
+            {"error": "Year, threshold and limit must be numbers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return Response(
+        [
+            {
+                "period": row["period"].isoformat(),
+                "rank": row["rank"],
+                **_ranked_product(request, row),
+                "quantity": row["quantity"],
+                "revenue": row["revenue"],
+            }
+            for row in rows
+        ]
+    )
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def top_selling_products(request):
     # Get the selected year from the query parameters (default to current year if not provided)
-    selected_year = request.query_params.get("year", timezone.now().year)
-    monthly_top_products = []
-
-    # Loop through each month (1-12)
-    for month in range(1, 13):
-        # Get total quantity sold for each product in this month, filter by minimum total_sold, and limit to 7 results
-        monthly_sales = (
-            OrderItem.objects.filter(
-                order__order_date_created__year=selected_year,  # Filter by selected year
-                order__order_date_created__month=month,
-            )
-            .values("product_id")
-            .annotate(total_sold=Sum("order_item_quantity"))
-            .filter(total_sold__gte=20)  # Only include products with total_sold >= 20
-            .order_by("-total_sold")[:7]  # Limit to top 7 results
-        )
+    selected_year = int(request.query_params.get("year", timezone.now().year))
 
-        for product_data in monthly_sales:
-            product_details = Product.objects.get(pk=product_data["product_id"])
-            monthly_top_products.append(
-                {
-                    "product_id": product_details.product_id,
-                    "product_name": product_details.product_name,
-                    "product_image": request.build_absolute_uri(
-                        product_details.product_image.url
-                    ),
-                    "product_type": product_details.product_type,  # Include product type
-                    "product_color": product_details.product_color,
-                    "product_size": product_details.product_size,  # Include product size
-                    "top_selling_month": timezone.datetime(
-                        int(selected_year), month, 1
-                    ).strftime(
-                        "%B"
-                    ),  # Display month name
-                    "total_sold": product_data["total_sold"],
-                }
-            )
+    # Top 7 products per month with total_sold >= 20, in one statement
+    monthly_top_products = [
+        {
+            **_ranked_product(request, row),
+            "top_selling_month": row["period"].strftime("%B"),  # Display month name
+            "total_sold": row["quantity"],
+        }
+        for row in rank_products(selected_year, "month", threshold=20, limit=7)
+    ]
 
     return Response(monthly_top_products)
 
@@ -1225,72 +1319,49 @@ def top_selling_products(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def low_selling_products(request):
-    current_year = timezone.now().year
-    monthly_low_products = []
-
-    # Loop through each month (1-12)
-    for month in range(1, 13):
-        # Get total quantity sold for each product in this month, filter by maximum total_sold, and limit to 7 results
-        monthly_sales = (
-            OrderItem.objects.filter(
-                order__order_date_created__year=current_year,
-                order__order_date_created__month=month,
-            )
-            .values("product_id")
-            .annotate(total_sold=Sum("order_item_quantity"))
-            .filter(total_sold__lt=20)  # Only include products with total_sold < 10
-            .order_by("total_sold")[:7]  # Limit to bottom 7 results (lowest sold)
-        )
+    selected_year = int(request.query_params.get("year", timezone.now().year))
 
-        for product_data in monthly_sales:
-            product_details = Product.objects.get(pk=product_data["product_id"])
-            monthly_low_products.append(
-                {
-                    "product_id": product_details.product_id,
-                    "product_name": product_details.product_name,
-                    "product_image": request.build_absolute_uri(
-                        product_details.product_image.url
-                    ),
-                    "product_type": product_details.product_type,  # Include product type
-                    "product_color": product_details.product_color,
-                    "product_size": product_details.product_size,  # Include product size
-                    "low_selling_month": timezone.datetime(
-                        current_year, month, 1
-                    ).strftime(
-                        "%B"
-                    ),  # Display month name
-                    "total_sold": product_data["total_sold"],
-                }
-            )
+    # Bottom 7 products per month with total_sold < 20, in one statement
+    monthly_low_products = [
+        {
+            **_ranked_product(request, row),
+            "low_selling_month": row["period"].strftime("%B"),  # Display month name
+            "total_sold": row["quantity"],
+        }
+        for row in rank_products(
+            selected_year, "month", direction="bottom", threshold=20, limit=7
+        )
+    ]
 
     return Response(monthly_low_products)
 
 
 @api_view(["GET"])
 def get_sales_data(request):
-    today = timezone.now().date()
-    current_year = timezone.now().year
+    # Business day and year in the shop's time zone, as in the rollup
+    today = shop_clock.now().date()
+    current_year = today.year
 
     # Calculate daily sales for orders with status "Paid"
     daily_sales = (
-        Order.objects.filter(
-            order_date_created__date=today, order_status="Paid"
-        ).aggregate(total=Sum("order_amount"))["total"]
+        DailySales.objects.filter(
+            daily_sales_date=today, daily_sales_status="Paid"
+        ).aggregate(total=Sum("daily_sales_revenue"))["total"]
         or 0
     )
 
     # Calculate annual sales for orders with status "Paid"
     annual_sales = (
-        Order.objects.filter(
-            order_date_created__year=current_year, order_status="Paid"
-        ).aggregate(total=Sum("order_amount"))["total"]
+        DailySales.objects.filter(
+            daily_sales_date__year=current_year, daily_sales_status="Paid"
+        ).aggregate(total=Sum("daily_sales_revenue"))["total"]
         or 0
     )
 
-    # Create response data
+    # Create response data; SQLite sums decimals as floats, round to cents
     sales_data = {
-        "daily_sales": daily_sales,
-        "annual_sales": annual_sales,
+        "daily_sales": to_cents(daily_sales),
+        "annual_sales": to_cents(annual_sales),
     }
 
     serializer = SalesDataSerializer(data=sales_data)
@@ -1301,19 +1372,21 @@ def get_sales_data(request):
 
 def get_paid_orders_by_month():
     # Get the current month and year
-    current_year = timezone.now().year
-    current_month = timezone.now().month
+    today = shop_clock.now().date()
 
-    # Query orders with "Paid" status, grouped by month
+    # Paid orders from the daily sales rollup, grouped by month
     paid_orders = (
-        Order.objects.filter(
-            order_status="Paid",
-            order_date_created__year=current_year,
-            order_date_created__month=current_month,
+        DailySales.objects.filter(
+            daily_sales_status="Paid",
+            daily_sales_date__year=today.year,
+            daily_sales_date__month=today.month,
         )
-        .annotate(month=TruncMonth("order_date_created"))
+        .annotate(month=TruncMonth("daily_sales_date"))
         .values("month")
-        .annotate(total_orders=Count("order_id"), total_amount=Sum("order_amount"))
+        .annotate(
+            total_orders=Sum("daily_sales_orders"),
+            total_amount=Sum("daily_sales_revenue"),
+        )
         .order_by("month")
     )
 
@@ -1342,7 +1415,11 @@ def order_history(request):
         orders = orders.filter(order_date_created__date__lte=parse_date(end_date))
 
     if order_number:
-        orders = orders.filter(order_id__icontains=order_number)
+        order_number_filter = Q(order_id__icontains=order_number)
+        if order_number.isdigit():
+            # Receipts printed before the per-month ID scheme
+            order_number_filter |= Q(order_legacy_id=order_number)
+        orders = orders.filter(order_number_filter)
 
     # Group items by order_id
     grouped_orders = []
@@ -1393,10 +1470,12 @@ def monthly_sales(request):
     month_end = request.GET.get("month_end", 12)
 
     monthly_sales_data = (
-        Order.objects.filter(order_status="Paid", order_date_created__year=year)
-        .annotate(month=ExtractMonth("order_date_created"))
+        DailySales.objects.filter(
+            daily_sales_status="Paid", daily_sales_date__year=year
+        )
+        .annotate(month=ExtractMonth("daily_sales_date"))
         .values("month")
-        .annotate(total_sales=Sum("order_amount"))
+        .annotate(total_sales=Sum("daily_sales_revenue"))
         .filter(month__gte=month_start, month__lte=month_end)
         .order_by("month")
     )
@@ -1419,20 +1498,16 @@ def daily_sales(request):
         return Response({"error": "Start date and end date are required."}, status=400)
 
     # Query to get total sales for each day in the specified date range
-    sales_data = (
-        Order.objects.filter(
-            order_date_created__date__gte=start_date,
-            order_date_created__date__lte=end_date,
-            order_status="Paid",
-        )
-        .values("order_date_created__date")
-        .annotate(total_sales=Sum("order_amount"))
-        .order_by("order_date_created__date")
-    )
+    sales_data = DailySales.objects.filter(
+        daily_sales_date__gte=start_date,
+        daily_sales_date__lte=end_date,
+        daily_sales_status="Paid",
+        daily_sales_orders__gt=0,  # Days whose paid orders were all voided
+    ).order_by("daily_sales_date")
 
     # Prepare the response data
     response_data = {
-        entry["order_date_created__date"].isoformat(): entry["total_sales"]
+        entry.daily_sales_date.isoformat(): entry.daily_sales_revenue
         for entry in sales_data
     }
 
@@ -1446,22 +1521,23 @@ def get_monthly_products_sold(request):
     month = request.GET.get("month")
 
     if year and month:
-        # Get the total sold for each product in the specified month and year
-        sold_products = (
-            OrderItem.objects.filter(
-                order__order_date_created__year=year,
-                order__order_date_created__month=month,
-                order__order_status="Paid",  # Ensure only paid orders are counted
-            )
-            .select_related("product")  # Fetch related product data
-            .values(
-                "product__product_id",  # Get product IDs
-                "product__product_image",
-                "product__product_name",
-                "product__product_color",
-                "product__product_size",
-            )
-            .annotate(total_sold=Sum("order_item_quantity"))  # Sum quantities sold
+        try:
+            selected_month = datetime(int(year), int(month), 1).date()
+        except ValueError:
+            return Response({"error": "Invalid year or month."}, status=400)
+
+        # Total sold for each product in the month, from the product sales
+        # rollup (paid orders only)
+        sold_products = ProductMonthlySales.objects.filter(
+            product_monthly_sales_month=selected_month,
+            product_monthly_sales_quantity__gt=0,
+        ).values(
+            "product__product_id",  # Get product IDs
+            "product__product_image",
+            "product__product_name",
+            "product__product_color",
+            "product__product_size",
+            total_sold=F("product_monthly_sales_quantity"),
         )
 
         # Create a list of products with their sold quantities and images
@@ -1513,14 +1589,22 @@ def sales_by_category(request):
 @permission_classes([IsAuthenticated])
 def clear_sales_data(request):
     try:
-        # Clear all order items
-        OrderItem.objects.all().delete()
+        with transaction.atomic():
+            # Pending orders are deleted too; free their stock
+            release_orders(
+                Order.objects.filter(order_status="Pending").values("order_id")
+            )
+
+            # Clear all order items
+            OrderItem.objects.all().delete()
 
-        # Clear all orders
-        Order.objects.all().delete()
+            # Clear all orders, and the daily sales rolled up from them
+            Order.objects.all().delete()
+            DailySales.objects.all().delete()
+            ProductMonthlySales.objects.all().delete()
 
-        # Reset product_sold for all products to 0
-        Product.objects.update(product_sold=0)
+            # Reset product_sold for all products to 0
+            Product.objects.update(product_sold=0)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
@@ -1531,8 +1615,18 @@ def clear_sales_data(request):
 @permission_classes([IsAuthenticated])
 def clear_customer_data(request):
     try:
-        # Clear all customer records
-        Customer.objects.all().delete()
+        with transaction.atomic():
+            # Pending orders are deleted too; free their stock
+            release_orders(
+                Order.objects.filter(order_status="Pending").values("order_id")
+            )
+
+            # Clear all customer records, and the orders that used to be
+            # deleted along with their placeholder customers
+            Order.objects.all().delete()
+            DailySales.objects.all().delete()
+            ProductMonthlySales.objects.all().delete()
+            Customer.objects.all().delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
@@ -1547,7 +1641,7 @@ def ping(request):
 class VATSettingView(APIView):
 
     def get(self, request):
-        vat_setting = VATSetting.objects.first()
+        vat_setting = vat_cache.setting()
         if not vat_setting:
             return Response(
                 {"error": "VAT setting not found."}, status=status.HTTP_404_NOT_FOUND
@@ -1560,42 +1654,44 @@ class VATSettingView(APIView):
         serializer = VATSettingSerializer(vat_setting, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            vat_cache.invalidate()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def get_sales_data_whole_year(request):
-    year = request.GET.get("year", timezone.now().year)
-
-    # Monthly sales data
-    monthly_sales = (
-        Order.objects.filter(order_date_created__year=year, order_status="Paid")
-        .annotate(month=ExtractMonth("order_date_created"))
+def _monthly_sales(year):
+    # Paid sales per month, from the daily sales rollup
+    return (
+        DailySales.objects.filter(
+            daily_sales_status="Paid", daily_sales_date__year=year
+        )
+        .annotate(month=ExtractMonth("daily_sales_date"))
         .values("month")
-        .annotate(total=Sum("order_amount"))
+        .annotate(total=Sum("daily_sales_revenue"))
         .order_by("month")
     )
 
-    # Daily sales data
-    daily_sales = (
-        Order.objects.filter(order_date_created__year=year, order_status="Paid")
-        .annotate(date=TruncDate("order_date_created"))
-        .values("date")
-        .annotate(total=Sum("order_amount"))
-        .order_by("date")
+
+def _daily_sales(year):
+    # Paid sales per day, from the daily sales rollup
+    return (
+        DailySales.objects.filter(
+            daily_sales_status="Paid",
+            daily_sales_date__year=year,
+            daily_sales_orders__gt=0,
+        )
+        .order_by("daily_sales_date")
+        .values(date=F("daily_sales_date"), total=F("daily_sales_revenue"))
     )
 
-    # Paid orders with product names, colors, sizes, and types for the selected year
-    paid_orders = (
-        Order.objects.filter(order_status="Paid")
-        .prefetch_related(
-            Prefetch(
-                "orderitem_set", queryset=OrderItem.objects.select_related("product")
-            )
+
+def _paid_orders(year):
+    # One row per item of the year's paid orders, in order ID order
+    return (
+        Order.objects.filter(
+            order_status="Paid", order_id__range=order_ids.id_range(year)
         )
-        .filter(order_id__startswith=str(year))  # Filter by year in order_id
+        .order_by("order_id", "orderitem__order_item_id")
         .values(
             "order_id",
             "order_amount",
@@ -1606,64 +1702,245 @@ def get_sales_data_whole_year(request):
         )
     )
 
-    # Prepare the response data for paid orders
-    paid_orders_data = []
-    for order in paid_orders:
-        paid_orders_data.append(
-            {
-                "order_id": order["order_id"],
-                "amount": order["order_amount"],
-                "product_name": order["orderitem__product__product_name"],
-                "product_type": order["orderitem__product__product_type"],
-                "color": order["orderitem__product__product_color"],
-                "size": order["orderitem__product__product_size"],
-            }
-        )
 
-    # Products sold data for the selected year
-    products_sold = (
-        OrderItem.objects.filter(
-            order__order_status="Paid", order__order_id__startswith=str(year)
+def _paid_orders_page(year, cursor, limit):
+    """The IDs of up to `limit` paid orders after `cursor`, and their rows.
+
+    Two short queries: a keyset query for the order IDs, then their items.
+    """
+    page = list(
+        Order.objects.filter(
+            order_status="Paid",
+            order_id__range=order_ids.id_range(year),
+            order_id__gt=cursor,
         )
+        .order_by("order_id")
+        .values_list("order_id", flat=True)[:limit]
+    )
+    rows = list(_paid_orders(year).filter(order_id__in=page)) if page else []
+    return page, rows
+
+
+def _paid_order_row(order):
+    return {
+        "order_id": order["order_id"],
+        "amount": order["order_amount"],
+        "product_name": order["orderitem__product__product_name"],
+        "product_type": order["orderitem__product__product_type"],
+        "color": order["orderitem__product__product_color"],
+        "size": order["orderitem__product__product_size"],
+    }
+
+
+def _products_sold(year):
+    # Paid quantity per product, from the product-by-month rollup
+    return (
+        ProductMonthlySales.objects.filter(product_monthly_sales_month__year=year)
         .values(
             "product__product_name",
             "product__product_type",
             "product__product_color",
             "product__product_size",
         )
-        .annotate(total_sold=Sum("order_item_quantity"))
+        .annotate(total_sold=Sum("product_monthly_sales_quantity"))
+        .filter(total_sold__gt=0)
+        .order_by("product__product_name", "product_id")
     )
 
-    # Prepare products sold data
-    products_sold_data = []
-    for product in products_sold:
-        products_sold_data.append(
-            {
-                "name": product["product__product_name"],
-                "product_type": product["product__product_type"],
-                "color": product["product__product_color"],
-                "size": product["product__product_size"],
-                "totalSold": product["total_sold"],
-            }
+
+def _product_sold_row(product):
+    return {
+        "name": product["product__product_name"],
+        "product_type": product["product__product_type"],
+        "color": product["product__product_color"],
+        "size": product["product__product_size"],
+        "totalSold": product["total_sold"],
+    }
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_sales_data_whole_year(request):
+    try:
+        year = int(request.GET.get("year", timezone.now().year))
+    except ValueError:
+        return Response(
+            {"error": "Year must be a number."}, status=status.HTTP_400_BAD_REQUEST
         )
 
+    # Paid orders with product names, colors, sizes, and types for the selected
+    # year; large years are better read with stream_sales_data_whole_year or
+    # paid_orders_whole_year
+    paid_orders_data = [
+        _paid_order_row(order) for order in _paid_orders(year).iterator()
+    ]
+
     return Response(
         {
-            "monthlySales": monthly_sales,
-            "dailySales": daily_sales,
+            "monthlySales": _monthly_sales(year),
+            "dailySales": _daily_sales(year),
             "paidOrders": paid_orders_data,
-            "productsSold": products_sold_data,
+            "productsSold": [
+                _product_sold_row(product) for product in _products_sold(year)
+            ],
         }
     )
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def stream_sales_data_whole_year(request):
+    """The whole-year sales report as NDJSON, one record per line.
+
+    Each line is `{"section": ..., "data": ...}` with the sections of
+    get_sales_data_whole_year in turn (monthlySales, dailySales,
+    productsSold, paidOrders), then `{"section": "end"}`. No cursor stays
+    open while the client reads: on SQLite it would hold the read lock that
+    kiosk commits wait for. The rollup sections (bounded by the calendar and
+    the catalog) are read with one query each, and paid orders
+    SALES_REPORT_CHUNK_SIZE orders at a time with keyset queries, so memory
+    use does not grow with the number of orders. Values are encoded as in
+    the one-shot report (DRF's encoder, so amounts are numbers).
+    """
+    try:
+        year = int(request.GET.get("year", timezone.now().year))
+    except ValueError:
+        return Response(
+            {"error": "Year must be a number."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def record(section, data):
+        return json.dumps({"section": section, "data": data}, cls=JSONEncoder) + "\n"
+
+    def records():
+        # Each query is read in full before anything is yielded
+        for section, rows in (
+            ("monthlySales", list(_monthly_sales(year))),
+            ("dailySales", list(_daily_sales(year))),
+            (
+                "productsSold",
+                [_product_sold_row(product) for product in _products_sold(year)],
+            ),
+        ):
+            for row in rows:
+                yield record(section, row)
+
+        cursor = 0
+        while True:
+            page, rows = _paid_orders_page(
+                year, cursor, settings.SALES_REPORT_CHUNK_SIZE
+            )
+            for row in rows:
+                yield record("paidOrders", _paid_order_row(row))
+            if len(page) < settings.SALES_REPORT_CHUNK_SIZE:
+                break
+            cursor = page[-1]
+        yield json.dumps({"section": "end"}) + "\n"
+
+    return StreamingHttpResponse(records(), content_type="application/x-ndjson")
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def paid_orders_whole_year(request):
+    """The paidOrders section of the whole-year report, a page at a time.
+
+    Pages hold the items of up to `limit` orders (default
+    SALES_REPORT_PAGE_SIZE) with IDs after `cursor`; pass the returned
+    `next_cursor` to get the next page, it is null on the last one.
+    """
+    try:
+        year = int(request.GET.get("year", timezone.now().year))
+        cursor = int(request.GET.get("cursor", 0))
+        limit = min(
+            int(request.GET.get("limit", settings.SALES_REPORT_PAGE_SIZE)),
+            settings.SALES_REPORT_MAX_PAGE_SIZE,
+        )
+    except ValueError:
+        return Response(
+            {"error": "Year, cursor and limit must be numbers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if limit < 1:
+        return Response(
+            {"error": "The limit must be at least 1."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    page, rows = _paid_orders_page(year, cursor, limit)
+
+    return Response(
+        {
+            "paidOrders": [_paid_order_row(order) for order in rows],
+            "next_cursor": page[-1] if len(page) == limit else None,
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_sales(request, dataset_name, file_format):
+    """Download orders, order items or products as CSV, Parquet or Arrow IPC.
+
+    `start` and `end` (YYYY-MM-DD, both optional and inclusive) limit orders
+    and order items to those created in that range. CSV is streamed as it is
+    read; the columnar formats are written to a temporary file first.
+    """
+    try:
+        start = parse_date(request.GET["start"]) if request.GET.get("start") else None
+        end = parse_date(request.GET["end"]) if request.GET.get("end") else None
+        valid_dates = not (
+            (request.GET.get("start") and start is None)
+            or (request.GET.get("end") and end is None)
+        )
+    except ValueError:
+        # Well formed but not a real date, e.g. 2024-02-30
+        valid_dates = False
+    if not valid_dates:
+        return Response(
+            {"error": "Dates must be valid dates in YYYY-MM-DD format."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if start and end and start > end:
+        return Response(
+            {"error": "The start date must not be after the end date."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        dataset(dataset_name)
+        if file_format not in FORMATS:
+            raise ExportError(f"Unknown format {file_format!r}.")
+        name = file_name(dataset_name, file_format, start, end)
+
+        if file_format == "csv":
+            response = StreamingHttpResponse(
+                iter_csv(dataset_name, start, end), content_type="text/csv"
+            )
+            response["Content-Disposition"] = f'attachment; filename="{name}"'
+            return response
+
+        export_file = tempfile.TemporaryFile()
+        try:
+            write_export(dataset_name, file_format, export_file, start, end)
+        except Exception:
+            export_file.close()
+            raise
+        export_file.seek(0)
+        return FileResponse(export_file, as_attachment=True, filename=name)
+    except ExportError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
 def update_order_item(request, order_id):
     try:
-        order = Order.objects.get(order_id=order_id)
+
         items_data = request.data.get("items", [])
 
+        # Validate the whole request before touching the database
+        edits = {}
         for item_data in items_data:
             order_item_id = item_data.get("order_item_id")
             new_quantity = item_data.get("quantity")
@@ -1682,47 +1959,117 @@ def update_order_item(request, order_id):
                 )
 
             try:
-                order_item = OrderItem.objects.get(
-                    order=order,
-                    order_item_id=order_item_id,
+                order_item_id = int(order_item_id)
+                new_quantity = int(new_quantity)
+                # Set discounted_price to None if it's not provided
+                if discounted_price is not None:
+                    discounted_price = Decimal(str(discounted_price))
+            except (TypeError, ValueError, InvalidOperation):
+                return Response(
+                    {"error": f"Invalid data for order item {order_item_id}."},
+                    status=status.HTTP_400_BAD_REQUEST,
                 )
-            except OrderItem.DoesNotExist:
+
+            if new_quantity < 0 or order_item_id in edits:
                 return Response(
-                    {
-                        "error": f"Order item with ID {order_item_id} not found in order {order_id}."
-                    },
-                    status=status.HTTP_404_NOT_FOUND,
+                    {"error": f"Invalid data for order item {order_item_id}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            edits[order_item_id] = (new_quantity, discounted_price)
+
+        invalid_version = _invalid_order_version(request)
+        if invalid_version:
+            return invalid_version
+
+        def update_items():
+            with transaction.atomic():
+                order = Order.objects.get(order_id=order_id)
+
+                # All edited lines in one query
+                order_items = OrderItem.objects.filter(
+                    order=order, order_item_id__in=edits
+                ).in_bulk()
+                for order_item_id in edits:
+                    if order_item_id not in order_items:
+                        return Response(
+                            {
+                                "error": f"Order item with ID {order_item_id} not found in order {order_id}."
+                            },
+                            status=status.HTTP_404_NOT_FOUND,
+                        )
+
+                # Pending orders hold a reservation for their quantities and
+                # paid ones have sold them; increases are checked against
+                # available stock
+                increases = {}
+                decreases = {}
+                for order_item_id, (new_quantity, discounted_price) in edits.items():
+                    order_item = order_items[order_item_id]
+                    change = new_quantity - order_item.order_item_quantity
+                    if change > 0:
+                        increases[order_item.product_id] = (
+                            increases.get(order_item.product_id, 0) + change
+                        )
+                    elif change < 0:
+                        decreases[order_item.product_id] = (
+                            decreases.get(order_item.product_id, 0) - change
+                        )
+                    order_item.order_item_quantity = new_quantity
+                    order_item.discounted_price = discounted_price
+
+                if order.order_status == "Pending":
+                    reserve_stock(increases, order.order_id)
+                    release_stock(decreases, order.order_id)
+                elif order.order_status == "Paid":
+                    sell_more(increases, order.order_id)
+                    return_sold(decreases, order.order_id)
+
+                # Settled orders are re-booked in the daily sales rollup
+                book_orders([order], -1)
+                OrderItem.objects.bulk_update(
+                    order_items.values(),
+                    ["order_item_quantity", "discounted_price"],
                 )
 
-            order_item.order_item_quantity = new_quantity
-            if discounted_price is not None:
-                order_item.discounted_price = discounted_price
-            else:
-                order_item.discounted_price = (
-                    None  # Set discounted_price to None if it's not provided
+                # Update the order amount; a paid order's includes VAT at the
+                # rate it was paid with, so its sales are not booked pre-VAT
+                order.order_amount = stored_order_subtotal(order.order_id)
+                if order.order_status == "Paid":
+                    order.order_amount = totals(
+                        order.order_amount, order.order_vat_percentage
+                    ).total
+                    order.order_change = order.order_paid_amount - order.order_amount
+                    if order.order_change < 0:
+                        transaction.set_rollback(True)
+                        return Response(
+                            {"error": "The new total is more than the amount paid."},
+                            status=status.HTTP_400_BAD_REQUEST,
+                        )
+                save_versioned(
+                    order,
+                    ["order_amount", "order_change"],
+                    "order_version",
+                    request.data.get("order_version"),
                 )
-            order_item.save()
+                book_orders([order])
 
-        # Update the order amount
-        order_items = OrderItem.objects.filter(order=order)
-        new_amount = sum(
-            (
-                item.discounted_price
-                if item.discounted_price is not None
-                else item.product_price
-            )
-            * item.order_item_quantity
-            for item in order_items
-        )
-        order.order_amount = new_amount
-        order.save()
+                return Response(
+                    {"message": "Order item updated successfully."},
+                    status=status.HTTP_200_OK,
+                )
 
-        return Response(
-            {"message": "Order item updated successfully."}, status=status.HTTP_200_OK
+        # Retried from the start if the order changes during the update
+        return retry_on_conflict(
+            update_items,
+            attempts=1 if request.data.get("order_version") else None,
         )
 
     except Order.DoesNotExist:
         return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+    except InsufficientStockError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         print(f"Error: {str(e)}")  # Log the error for debugging
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1732,7 +2079,6 @@ def update_order_item(request, order_id):
 @permission_classes([IsAuthenticated])
 def update_order_amount(request, order_id):
     try:
-        order = Order.objects.get(order_id=order_id)
         new_amount = request.data.get("order_amount")
 
         if new_amount is None:
@@ -1741,8 +2087,28 @@ def update_order_amount(request, order_id):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        order.order_amount = new_amount
-        order.save()
+        invalid_version = _invalid_order_version(request)
+        if invalid_version:
+            return invalid_version
+
+        def update_amount():
+            with transaction.atomic():
+                order = Order.objects.get(order_id=order_id)
+                # Settled orders are re-booked in the daily sales rollup
+                book_orders([order], -1)
+                order.order_amount = new_amount
+                save_versioned(
+                    order,
+                    ["order_amount"],
+                    "order_version",
+                    request.data.get("order_version"),
+                )
+                book_orders([order])
+
+        retry_on_conflict(
+            update_amount,
+            attempts=1 if request.data.get("order_version") else None,
+        )
 
         return Response(
             {"message": "Order amount updated successfully."}, status=status.HTTP_200_OK
@@ -1750,6 +2116,8 @@ def update_order_amount(request, order_id):
 
     except Order.DoesNotExist:
         return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+    except ConflictError as e:
+        return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         print(f"Error: {str(e)}")  # Log the error for debugging
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -115,6 +115,10 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Take the write lock when a transaction begins: a deferred one that
+        # reads first fails with "database is locked" when it tries to write
+        # while other kiosks are writing
+        "OPTIONS": {"transaction_mode": "IMMEDIATE"},
     }
 }
 
@@ -167,3 +171,73 @@ BACKUP_DIR = os.path.join(BASE_DIR, "backups")  # Directory to save backups
 
 # Ensure the backup directory exists
 os.makedirs(BACKUP_DIR, exist_ok=True)
+
+# ID allocator settings: how many IDs each entity leases from its counter per
+# database round-trip. Unused IDs of a block are skipped after a restart.
+ID_ALLOCATOR_BLOCK_SIZES = {
+    "order": 10,
+    "order_item": 50,
+    "customer": 10,
+}
+
+# Kiosk order ingestion: when enabled, create_order queues orders for a single
+# committer thread that writes them in batched transactions (group commit).
+ORDER_GROUP_COMMIT = False
+ORDER_GROUP_COMMIT_MAX_BATCH = 50  # Maximum orders per transaction
+ORDER_GROUP_COMMIT_MAX_WAIT_MS = 5  # How long a batch waits for more orders
+ORDER_GROUP_COMMIT_TIMEOUT = 30  # Seconds a queued order waits before a 503
+
+# Time zone of the shop, used for business days (e.g. daily queue numbers)
+SHOP_TIME_ZONE = "Asia/Manila"
+
+# Optional reference clock (worldtimeapi-style JSON) used to correct the local
+# clock for receipt times, e.g. "http://worldtimeapi.org/api/timezone/Asia/Manila".
+# It is only queried from a background thread, never while printing.
+TIME_REFERENCE_URL = None
+TIME_REFERENCE_REFRESH_SECONDS = 60 * 60
+
+# RPi print server (framed protocol, see accounts/print_client.py)
+PRINT_SERVER_HOST = "192.168.254.183"
+PRINT_SERVER_PORT = 8001  # Use port 8001 to connect to the print server
+
+# Receipt print outbox: failed deliveries to the print server are retried with
+# exponential backoff (base * 2^attempt seconds, capped) up to a maximum.
+PRINT_JOB_MAX_ATTEMPTS = 5
+PRINT_JOB_RETRY_BASE_SECONDS = 2
+PRINT_JOB_RETRY_MAX_SECONDS = 60
+PRINT_JOB_BATCH_SIZE = 10  # Jobs pipelined to the print server at once
+
+# POS receipt printer attached to the cashier PC
+RECEIPT_PRINTER_BACKEND = "win32"  # One of "win32", "socket", "file" or "null"
+RECEIPT_PRINTER_NAME = "POS58 v9"  # Windows printer name for "win32"
+RECEIPT_PRINTER_SOCKET = ("127.0.0.1", 9100)  # Raw ESC/POS address for "socket"
+RECEIPT_PRINTER_FILE = BASE_DIR / "receipts.bin"  # Output file for "file"
+RECEIPT_PRINT_TIMEOUT = 30  # Seconds pay_order waits for the receipt
+PRINTER_STATUS_POLL_SECONDS = 5  # How often the printer monitor checks the printer
+
+# Optimistic concurrency: order and product updates only apply if the row's
+# version has not changed since it was read; conflicts are retried a few
+# times before the request fails with 409.
+CONFLICT_RETRY_ATTEMPTS = 3
+CONFLICT_RETRY_DELAY_SECONDS = 0.05  # Grows linearly with each attempt
+
+# The VAT setting is cached per process; saving it clears the cache of the
+# process that handled the change, other processes reload after this long.
+VAT_CACHE_SECONDS = 60
+
+# Pending orders abandoned at the kiosk can be voided (and their stock
+# released) once they are this old, e.g. 120. Off (None) unless set; the
+# sweep runs in `manage.py expire_pending_orders --watch` (or from cron).
+PENDING_ORDER_EXPIRY_MINUTES = None
+PENDING_ORDER_SWEEP_SECONDS = 300  # How often expire_pending_orders --watch runs
+PENDING_ORDER_EXPIRY_BATCH = 500  # Orders voided per transaction
+
+# Whole-year sales report: paid orders read per keyset query when streaming,
+# and paidOrders page sizes (in orders) when paginating.
+SALES_REPORT_CHUNK_SIZE = 2000
+SALES_REPORT_PAGE_SIZE = 500
+SALES_REPORT_MAX_PAGE_SIZE = 5000
+
+# Bulk exports (api/exports/ and manage.py export_sales) read this many rows
+# per query.
+EXPORT_CHUNK_SIZE = 5000